@@ -6,7 +6,7 @@ from flask_bootstrap import Bootstrap
 
 from app.core.content import ApiResponse
 from app.core.jsonencoder import CustomJSONEncoder
-from config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND, QUEUE_VISIBILITY_TIMEOUT
+from config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND, QUEUE_VISIBILITY_TIMEOUT, TRAINING_QUEUE
 
 celery = Celery(__name__, broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
 
@@ -89,7 +89,7 @@ def create_app(config_filename, register_blueprints=True):
 
     app.json_encoder = CustomJSONEncoder
 
-    for folder in ['UPLOAD_ROOT_FOLDER', 'TEMPORARY_UPLOAD_FOLDER', 'TRAIN_ROOT_FOLDER']:
+    for folder in ['UPLOAD_ROOT_FOLDER', 'TEMPORARY_UPLOAD_FOLDER', 'PROBABILITIES_CACHE_FOLDER', 'TRAIN_ROOT_FOLDER']:
         path = Path(app.config[folder])
         path.mkdir(parents=True, exist_ok=True)
 
@@ -107,4 +107,9 @@ def make_celery(app):
     celery.conf['broker_transport_options'] = {
         'visibility_timeout': QUEUE_VISIBILITY_TIMEOUT
     }
+    # trainings go to a worker which is restarted after each task, to give back their memory,
+    # while detections and diagnostics stay on the default queue, to keep the restored detectives cached
+    celery.conf['task_routes'] = {
+        'train_task': {'queue': TRAINING_QUEUE}
+    }
     return celery
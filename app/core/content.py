@@ -1,5 +1,13 @@
+import json
+import struct
+
+import numpy as np
+import pandas as pd
 from flask import make_response, render_template, jsonify, g
 
+BINARY_MIMETYPE = 'application/octet-stream'
+BINARY_ALIGNMENT = 8
+
 
 class ApiResponse:
     def __init__(self, content_type, next=None, template=None, context=None, status_code=200):
@@ -42,3 +50,71 @@ class ApiResponse:
 
     def set_cookie(self, key, value, expires):
         self.response.set_cookie(key, value, expires=expires)
+
+
+def data_frame_to_binary(data_frame):
+    """
+    Serialises a dataframe in a compact columnar format:
+
+     - the length of the header, as a little endian uint32
+     - the utf-8 json header, padded with spaces so that the arrays are 8 bytes aligned
+     - the index as little endian float64 (seconds for time deltas), unless its labels are in the header
+     - every column as little endian float32, one after the other
+
+    :param pd.DataFrame data_frame:
+    :return bytes:
+    """
+    index = data_frame.index
+    header = {
+        'columns': [str(column) for column in data_frame.columns],
+        'number_of_rows': len(data_frame),
+        'dtype': '<f4',
+        'index': {'name': index.name}
+    }
+
+    if isinstance(index, pd.TimedeltaIndex):
+        index_data = index.total_seconds().values.astype('<f8')
+        header['index'].update({'dtype': '<f8', 'unit': 'seconds'})
+    elif pd.api.types.is_numeric_dtype(index):
+        index_data = index.values.astype('<f8')
+        header['index'].update({'dtype': '<f8'})
+    else:
+        index_data = np.empty(0, dtype='<f8')
+        header['index'].update({'labels': [str(label) for label in index]})
+
+    encoded_header = json.dumps(header).encode('utf-8')
+    padding = -(4 + len(encoded_header)) % BINARY_ALIGNMENT
+    encoded_header += b' ' * padding
+
+    data = np.ascontiguousarray(data_frame.values.T, dtype='<f4')
+
+    return b''.join([
+        struct.pack('<I', len(encoded_header)),
+        encoded_header,
+        index_data.tobytes(),
+        data.tobytes()
+    ])
+
+
+class DataFrameResponse:
+    def __init__(self, content_type, data_frame, default_response):
+        """
+        A response for the data endpoints.
+
+        The dataframe is serialised with data_frame_to_binary when the client accepts BINARY_MIMETYPE,
+        otherwise the default response is used.
+
+        :param str content_type: the mimetype for the format accepted by the client
+        :param pd.DataFrame data_frame: the data to serialise
+        :param callable default_response: returns the response for the other mimetypes
+        """
+        if content_type == BINARY_MIMETYPE:
+            response = make_response(data_frame_to_binary(data_frame))
+            response.mimetype = BINARY_MIMETYPE
+        else:
+            response = default_response()
+
+        self.response = response
+
+    def __call__(self, *args, **kwargs):
+        return self.response
@@ -1,7 +1,6 @@
 import abc
 import logging
 
-import pandas as pd
 from flask import json
 
 from app.core.jsonencoder import CustomJSONEncoder
@@ -10,13 +9,13 @@ from app.core.schemas import (
     CompanyConfigurationSchema, DetectionTaskStatusSchema, DetectionResultSchema, DiagnosticTaskSchema,
     DiagnosticTaskStatusSchema, DiagnosticResultSchema, DataSourceConfigurationSchema, TrainingTaskSchema,
     TrainingTaskStatusSchema)
+from app.core.storage import open_flight_store, open_flight_pyramid
 from app.entities import (
     UserEntity, CompanyEntity, DetectionTaskEntity, DetectionResultEntity, DataSourceEntity,
     CompanyConfigurationEntity, DetectionTaskStatusEntity,
     DiagnosticTaskEntity, DiagnosticTaskStatusEntity, DiagnosticResultEntity, TrainingTaskEntity,
     TrainingTaskStatusEntity)
 from app.entities.datasource import DataSourceConfigurationEntity
-from config import HDF5_STORE_INDEX
 
 
 class EntityCreationException(Exception):
@@ -109,10 +108,14 @@ class DataSource(BaseModel):
     SCHEMA = DataSourceSchema
     MODEL = DataSourceEntity
 
+    def get_store(self, build_missing=True):
+        return open_flight_store(self.location, build_missing)
+
     def get_file(self):
-        with pd.HDFStore(self.location) as hdf_store:
-            dataframe = hdf_store[HDF5_STORE_INDEX]
-            return dataframe
+        return self.get_store().read()
+
+    def get_pyramid(self, build_missing=True):
+        return open_flight_pyramid(self.location, float(self.meta['sample_rate']), build_missing)
 
 
 class DetectionResult(BaseModel):
@@ -0,0 +1,395 @@
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from config import HDF5_STORE_INDEX, DOWNSAMPLE_PYRAMID_LEVELS
+
+D_TYPE = np.float32
+
+DATA_SUFFIX = '.npy'
+HEADER_SUFFIX = '.json'
+TEMPORARY_SUFFIX = '.tmp'
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024  # rows converted at once when building a store
+
+PYRAMID_STATISTICS = ('mean', 'min', 'max')
+PYRAMID_BLOCK_DURATION = 3600  # seconds of flight downsampled at once when building a pyramid
+
+
+class FlightNotPreparedError(Exception):
+    """ Raised when the store or the pyramid of a flight are read before being built """
+    pass
+
+
+def create_temporary_location(location):
+    """
+    Creates an empty temporary file next to location, with a unique name so that concurrent
+    writers of the same file never write into each other's output.
+
+    :return str: the location of the temporary file, to be moved on location with os.replace
+    """
+    file_descriptor, temporary_location = tempfile.mkstemp(
+        prefix=os.path.basename(location) + '.', suffix=TEMPORARY_SUFFIX, dir=os.path.dirname(location)
+    )
+    os.close(file_descriptor)
+    return temporary_location
+
+
+def replace_atomically(location, write):
+    """
+    Writes location through write(temporary_location), then moves the temporary file in place.
+    The temporary file is removed if write fails.
+    """
+    temporary_location = create_temporary_location(location)
+    try:
+        write(temporary_location)
+        os.replace(temporary_location, location)
+    except BaseException:
+        if os.path.exists(temporary_location):
+            os.remove(temporary_location)
+        raise
+
+
+def get_hdf_shape(hdf_store, key=HDF5_STORE_INDEX):
+    """
+    Reads the (rows, columns) shape of a dataframe stored in a HDFStore
+    out of the file metadata, without loading the data.
+
+    :param pd.HDFStore hdf_store: an open HDFStore
+    :param str key: the key of the dataframe
+
+    :return tuple: (number of rows, number of columns)
+    """
+    storer = hdf_store.get_storer(key)
+    if storer.is_table:
+        return int(storer.nrows), int(storer.ncols)
+
+    number_of_rows, number_of_columns = storer.shape
+    return int(number_of_rows), int(number_of_columns)
+
+
+def iterate_hdf_blocks(hdf_store, key=HDF5_STORE_INDEX, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Yields the dataframe stored under key in blocks of at most block_size rows.
+    """
+    number_of_rows, _ = get_hdf_shape(hdf_store, key)
+    for start in range(0, number_of_rows, block_size):
+        yield start, hdf_store.select(key, start=start, stop=min(start + block_size, number_of_rows))
+
+
+class FlightStore:
+    """
+    Memory mapped storage of a flight.
+
+    The data lives next to the original upload as a float32 `.npy` file of shape
+    [n_sensors, n_timesteps], so that every sensor is contiguous on disk, plus a small
+    json header containing the sensor names. Reads only touch the requested rows and sensors.
+    """
+
+    def __init__(self, location):
+        """
+        :param str location: the location of the original flight file
+        """
+        self._location = location
+        self._header = None
+        self._data = None
+
+    @property
+    def location(self):
+        return self._location
+
+    @property
+    def data_location(self):
+        return self._location + DATA_SUFFIX
+
+    @property
+    def header_location(self):
+        return self._location + HEADER_SUFFIX
+
+    def exists(self):
+        # the header is written last, so its presence means the store is complete
+        return os.path.exists(self.header_location) and os.path.exists(self.data_location)
+
+    @property
+    def header(self):
+        if self._header is None:
+            with open(self.header_location) as header_file:
+                self._header = json.load(header_file)
+        return self._header
+
+    @property
+    def columns(self):
+        return self.header['columns']
+
+    @property
+    def data(self):
+        """ The read-only memory map of shape [n_sensors, n_timesteps] """
+        if self._data is None:
+            self._data = np.load(self.data_location, mmap_mode='r')
+        return self._data
+
+    @property
+    def number_of_sensors(self):
+        return self.data.shape[0]
+
+    @property
+    def number_of_timesteps(self):
+        return self.data.shape[1]
+
+    def get_sensor_indexes(self, columns=None):
+        if columns is None:
+            return list(range(self.number_of_sensors))
+        return [self.columns.index(column) for column in columns]
+
+    def read_array(self, start=None, stop=None, columns=None):
+        """
+        Reads a portion of the flight in memory.
+
+        :param int start: the first timestep to read
+        :param int stop: the timestep to stop at (excluded)
+        :param list columns: the sensors to read, all of them if None
+
+        :return np.ndarray: array of shape [n_sensors, n_timesteps]
+        """
+        if columns is None:
+            return np.array(self.data[:, start:stop])
+        return np.array(self.data[self.get_sensor_indexes(columns), start:stop])
+
+    def read(self, start=None, stop=None, columns=None):
+        """
+        Reads a portion of the flight as a dataframe of shape [n_timesteps, n_sensors]
+        """
+        start, stop, _ = slice(start, stop).indices(self.number_of_timesteps)
+        data = self.read_array(start, stop, columns)
+        return pd.DataFrame(
+            data.T,
+            columns=self.columns if columns is None else columns,
+            index=pd.RangeIndex(start, start + data.shape[1])
+        )
+
+    def delete(self):
+        for location in [self.header_location, self.data_location]:
+            try:
+                os.remove(location)
+            except OSError:
+                logging.debug(f"Trying to remove the non existent store file {location}")
+
+    def _write(self, columns, number_of_timesteps, blocks):
+        """
+        Writes the store out of an iterable of (start, [n_rows, n_sensors] array)
+        """
+        def write_data(temporary_data_location):
+            data = np.lib.format.open_memmap(
+                temporary_data_location, mode='w+', dtype=D_TYPE, shape=(len(columns), number_of_timesteps)
+            )
+            for start, block in blocks:
+                data[:, start:start + block.shape[0]] = block.T
+            data.flush()
+            del data
+
+        def write_header(temporary_header_location):
+            with open(temporary_header_location, 'w') as header_file:
+                json.dump({'columns': columns, 'dtype': np.dtype(D_TYPE).str}, header_file)
+
+        # the header is written last: exists() only sees complete stores
+        replace_atomically(self.data_location, write_data)
+        replace_atomically(self.header_location, write_header)
+
+        self._header = None
+        self._data = None
+
+    @staticmethod
+    def _columns_to_list(columns):
+        return [column.item() if hasattr(column, 'item') else column for column in columns]
+
+    @classmethod
+    def from_dataframe(cls, location, dataframe, block_size=DEFAULT_BLOCK_SIZE):
+        store = cls(location)
+        values = dataframe.values
+        store._write(
+            cls._columns_to_list(dataframe.columns),
+            values.shape[0],
+            ((start, values[start:start + block_size]) for start in range(0, values.shape[0], block_size))
+        )
+        return store
+
+    @classmethod
+    def from_hdf(cls, location, key=HDF5_STORE_INDEX, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Builds the store out of the HDF5 file at location, converting it in blocks of rows
+        """
+        store = cls(location)
+        with pd.HDFStore(location, 'r') as hdf_store:
+            number_of_rows, _ = get_hdf_shape(hdf_store, key)
+            columns = hdf_store.select(key, start=0, stop=1).columns
+            store._write(
+                cls._columns_to_list(columns),
+                number_of_rows,
+                ((start, block.values) for start, block in iterate_hdf_blocks(hdf_store, key, block_size))
+            )
+        return store
+
+
+def open_flight_store(location, build_missing=True):
+    """
+    Returns the store for the flight at location, building it out of the HDF5 file if
+    it's not been created yet (i.e. flights uploaded before the store existed).
+
+    :param bool build_missing: if False a missing store raises FlightNotPreparedError instead of being built,
+     the web requests use it to never run the conversion of a whole flight
+    """
+    store = FlightStore(location)
+    if not store.exists():
+        if not build_missing:
+            raise FlightNotPreparedError(f"The store of {location} has not been built yet")
+        logging.info(f"Building the flight store for {location}")
+        store = FlightStore.from_hdf(location)
+    return store
+
+
+class FlightPyramid:
+    """
+    Multi resolution downsampling of a flight.
+
+    Every level is stored next to the flight as a float32 `.npy` file of shape
+    [n_statistics, n_sensors, n_bins], where each bin covers `level` seconds of flight
+    and the statistics are the ones in PYRAMID_STATISTICS.
+    """
+
+    def __init__(self, location, levels=DOWNSAMPLE_PYRAMID_LEVELS):
+        """
+        :param str location: the location of the original flight file
+        :param list levels: the duration in seconds of the bins of each level
+        """
+        self._location = location
+        self._levels = sorted(levels)
+        self._data = {}
+
+    @property
+    def levels(self):
+        return self._levels
+
+    def get_level_location(self, level):
+        return f"{self._location}.pyramid_{level}s{DATA_SUFFIX}"
+
+    def exists(self):
+        return all(os.path.exists(self.get_level_location(level)) for level in self._levels)
+
+    def get_level(self, level):
+        """ The read-only memory map of shape [n_statistics, n_sensors, n_bins] for the level """
+        if level not in self._data:
+            self._data[level] = np.load(self.get_level_location(level), mmap_mode='r')
+        return self._data[level]
+
+    def select_level(self, duration, max_points=None):
+        """
+        Returns the finest level which doesn't exceed max_points bins over duration seconds.
+        If none of them does, the coarsest is returned.
+        """
+        if not max_points:
+            return self._levels[0]
+
+        for level in self._levels:
+            if duration / level <= max_points:
+                return level
+
+        return self._levels[-1]
+
+    def read_array(self, level, statistic='mean', start=None, stop=None, sensor_indexes=None):
+        """
+        :param int level: the level to read
+        :param str statistic: one of PYRAMID_STATISTICS
+        :param int start: the first bin to read
+        :param int stop: the bin to stop at (excluded)
+        :param list sensor_indexes: the sensors to read, all of them if None
+
+        :return np.ndarray: array of shape [n_sensors, n_bins]
+        """
+        data = self.get_level(level)[PYRAMID_STATISTICS.index(statistic)]
+        if sensor_indexes is None:
+            return np.array(data[:, start:stop])
+        return np.array(data[sensor_indexes, start:stop])
+
+    def delete(self):
+        for level in self._levels:
+            try:
+                os.remove(self.get_level_location(level))
+            except OSError:
+                logging.debug(f"Trying to remove the non existent pyramid level {level} for {self._location}")
+
+    def _write_level(self, level, data):
+        def write_level(temporary_level_location):
+            with open(temporary_level_location, 'wb') as level_file:
+                np.save(level_file, data.astype(D_TYPE, copy=False))
+
+        replace_atomically(self.get_level_location(level), write_level)
+
+    @classmethod
+    def from_store(cls, store, sample_rate, levels=DOWNSAMPLE_PYRAMID_LEVELS):
+        """
+        Builds the pyramid out of a FlightStore.
+
+        The finest level is computed from the raw data, a block of bins at a time; the other
+        levels are aggregated from it, so they must be multiples of the finest one.
+
+        :param FlightStore store: the flight
+        :param float sample_rate: the number of timesteps per second
+        :param list levels: the duration in seconds of the bins of each level
+        """
+        pyramid = cls(store.location, levels)
+        finest_level = pyramid.levels[0]
+        for level in pyramid.levels:
+            if level % finest_level:
+                raise ValueError(f"Pyramid level {level}s is not a multiple of {finest_level}s")
+
+        number_of_timesteps = store.number_of_timesteps
+        bin_length = finest_level * sample_rate
+        number_of_bins = int(np.ceil(number_of_timesteps / bin_length))
+        bin_starts = np.round(np.arange(number_of_bins) * bin_length).astype(np.int64)
+        bin_stops = np.append(bin_starts[1:], number_of_timesteps)
+
+        sums = np.empty((store.number_of_sensors, number_of_bins), dtype=np.float64)
+        minimums = np.empty((store.number_of_sensors, number_of_bins), dtype=D_TYPE)
+        maximums = np.empty((store.number_of_sensors, number_of_bins), dtype=D_TYPE)
+        counts = bin_stops - bin_starts
+
+        bins_per_block = max(1, PYRAMID_BLOCK_DURATION // finest_level)
+        for first_bin in range(0, number_of_bins, bins_per_block):
+            last_bin = min(first_bin + bins_per_block, number_of_bins)
+            block_start = bin_starts[first_bin]
+            block = store.data[:, block_start:bin_stops[last_bin - 1]]
+            block_bin_starts = bin_starts[first_bin:last_bin] - block_start
+
+            sums[:, first_bin:last_bin] = np.add.reduceat(block, block_bin_starts, axis=1, dtype=np.float64)
+            minimums[:, first_bin:last_bin] = np.minimum.reduceat(block, block_bin_starts, axis=1)
+            maximums[:, first_bin:last_bin] = np.maximum.reduceat(block, block_bin_starts, axis=1)
+
+        for level in pyramid.levels:
+            level_bin_starts = np.arange(0, number_of_bins, level // finest_level)
+            level_counts = np.add.reduceat(counts, level_bin_starts)
+            pyramid._write_level(level, np.stack([
+                np.add.reduceat(sums, level_bin_starts, axis=1) / level_counts,
+                np.minimum.reduceat(minimums, level_bin_starts, axis=1),
+                np.maximum.reduceat(maximums, level_bin_starts, axis=1),
+            ]))
+
+        return pyramid
+
+
+def open_flight_pyramid(location, sample_rate, build_missing=True):
+    """
+    Returns the pyramid for the flight at location, building it if it's not been created yet.
+
+    :param bool build_missing: if False a missing pyramid raises FlightNotPreparedError instead of being built
+    """
+    pyramid = FlightPyramid(location)
+    if not pyramid.exists():
+        if not build_missing:
+            raise FlightNotPreparedError(f"The downsample pyramid of {location} has not been built yet")
+        logging.info(f"Building the downsample pyramid for {location}")
+        pyramid = FlightPyramid.from_store(open_flight_store(location), sample_rate)
+    return pyramid
@@ -5,7 +5,7 @@ import uuid
 from copy import deepcopy
 from functools import wraps
 
-from flask import request, g, json, url_for, redirect, abort, flash
+from flask import request, g, json, url_for, redirect, abort, flash, has_request_context
 
 from app.core.auth import is_user_logged
 from app.core.jsonencoder import CustomJSONEncoder
@@ -27,6 +27,46 @@ def parse_request_data(fn):
     return wrapper
 
 
+def model_id(model):
+    """ The id of an entity, or of the entity wrapped by a BaseModel, None if it has none """
+    return getattr(getattr(model, '_model', model), 'id', None)
+
+
+def request_memoize(name, key=model_id):
+    """
+    Memoises the decorated function for the duration of the current request, so that objects derived
+    from the database (e.g. the watson detection result) are built at most once per request.
+
+    The result is stored on flask g under (name, key(*args, **kwargs)). Out of a request, e.g. in the celery tasks,
+    or when the key is None (e.g. a model not saved yet) the function is always called.
+
+    :param str name: the name of the derived object
+    :param key: the function building the key out of the arguments, the id of the first one by default
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not has_request_context():
+                return fn(*args, **kwargs)
+
+            object_key = key(*args, **kwargs)
+            if object_key is None:
+                return fn(*args, **kwargs)
+
+            memo = getattr(g, '_request_memo', None)
+            if memo is None:
+                memo = g._request_memo = {}
+
+            memo_key = (name, object_key)
+            if memo_key not in memo:
+                memo[memo_key] = fn(*args, **kwargs)
+            return memo[memo_key]
+
+        return wrapper
+
+    return decorator
+
+
 def json_reload(json_as_a_dict):
     return json.loads(json.dumps(json_as_a_dict, cls=CustomJSONEncoder))
 
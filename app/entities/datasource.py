@@ -1,16 +1,16 @@
 import enum
 import os
 
-import pandas as pd
 from sqlalchemy import Column, Integer, ForeignKey, String, Enum, JSON, UniqueConstraint
 from sqlalchemy import event
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.exc import NoResultFound
 
+from app.core.storage import open_flight_store, open_flight_pyramid
 from app.database import local_session_scope
 from app.entities import BaseEntity, CustomerActionEntity, Actions
 from app.entities.training import training_datasource_association
-from config import HDF5_STORE_INDEX, UPLOAD_ROOT_FOLDER
+from config import UPLOAD_ROOT_FOLDER
 
 
 class UploadTypes(enum.Enum):
@@ -88,10 +88,14 @@ class DataSourceEntity(BaseEntity):
     def location(self):
         return os.path.join(UPLOAD_ROOT_FOLDER, str(self.company_id), self.filename)
 
+    def get_store(self, build_missing=True):
+        return open_flight_store(self.location, build_missing)
+
     def get_file(self):
-        with pd.HDFStore(self.location) as hdf_store:
-            dataframe = hdf_store[HDF5_STORE_INDEX]
-            return dataframe
+        return self.get_store().read()
+
+    def get_pyramid(self, build_missing=True):
+        return open_flight_pyramid(self.location, float(self.meta['sample_rate']), build_missing)
 
     @staticmethod
     def get_for_user(user_id):
@@ -1,4 +1,4 @@
-from sqlalchemy import event, Column, String, ForeignKey, Integer
+from sqlalchemy import event, Column, String, ForeignKey, Integer, LargeBinary
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.exc import NoResultFound
@@ -115,12 +115,15 @@ class DetectionTaskStatusEntity(BaseEntity):
 class DetectionResultEntity(BaseEntity):
     __tablename__ = 'detection_result'
 
+    EXCLUDE_ATTRIBUTES = ('scores',)
+
     company_id = Column(Integer, ForeignKey('company.id'), nullable=False)
     company = relationship('CompanyEntity', back_populates='detection_results')
 
     upload_code = Column(String(60), index=True)
     task_code = Column(String(60), unique=True, index=True)
     result = Column(JSONB)
+    scores = Column(LargeBinary, nullable=True)  # compressed raw scores, the metadata is in result
 
     detection_task_id = Column(Integer, ForeignKey('detection_task.id'), nullable=False)
     detection_task = relationship('DetectionTaskEntity', back_populates='detection_result',
@@ -85,6 +85,7 @@ class DiagnosticResultEntity(BaseEntity):
     __tablename__ = 'diagnostic_result'
 
     INCLUDE_ATTRIBUTES = ('company_id', 'diagnostic_task_id', 'upload_code', 'task_code', 'result')
+    EXCLUDE_ATTRIBUTES = ('plot', 'plot_digest')
 
     company_id = Column(ForeignKey('company.id'), nullable=False)
     company = relationship('CompanyEntity', back_populates='diagnostic_results')
@@ -93,6 +94,8 @@ class DiagnosticResultEntity(BaseEntity):
     task_code = Column(String(60), unique=True, index=True)
 
     result = Column(JSONB)
+    plot = Column(JSONB, nullable=True)  # the result as served by the plot endpoint, built at diagnosis time
+    plot_digest = Column(String(40), nullable=True)  # the ETag of the plot endpoint
 
     diagnostic_task_id = Column(ForeignKey('diagnostic_task.id'), nullable=False)
     diagnostic_task = relationship('DiagnosticTaskEntity', foreign_keys=diagnostic_task_id,
@@ -9,6 +9,9 @@ from sqlalchemy.schema import Table
 from app.entities import BaseEntity, TaskStatusTypes
 from config import TRAIN_ROOT_FOLDER
 
+TRANSFORMER_FILENAME = 'transformer.pickle'
+TRAINING_DATA_FILENAME = 'training_data.npy'
+
 
 training_datasource_association = Table(
     'datasources_to_training_task', BaseEntity.metadata,
@@ -71,6 +74,14 @@ class TrainingTaskEntity(BaseEntity):
     def train_data_dir(self):
         return os.path.join(TRAIN_ROOT_FOLDER, str(self.company_id), self.task_code)
 
+    @property
+    def transformer_location(self):
+        return os.path.join(self.train_data_dir, TRANSFORMER_FILENAME)
+
+    @property
+    def training_data_location(self):
+        return os.path.join(self.train_data_dir, TRAINING_DATA_FILENAME)
+
     @classmethod
     def get_for_company_id(cls, company_id):
         return cls.query.filter(cls.company_id == company_id)
@@ -1,8 +1,15 @@
 import abc
+import os
+import time
 
 from collections import namedtuple
 
+import numpy as np
+
+from config import TEMPORARY_UPLOAD_FOLDER, HDF5_STORE_INDEX
+
 InterpreterResult = namedtuple('InterpreterResult', 'result errors')
+UploadedFlight = namedtuple('UploadedFlight', 'location key number_of_rows number_of_columns')
 
 
 class AbstractDatasourceInterpreter(metaclass=abc.ABCMeta):
@@ -10,3 +17,26 @@ class AbstractDatasourceInterpreter(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def from_upload_to_dataframe(self, uploaded_file, datasource_type_id):
         raise NotImplementedError
+
+    def from_upload_to_file(self, uploaded_file, datasource_type_id):
+        """
+        Validates the upload and saves it as an HDF5 file in the temporary folder.
+
+        Interpreters which can validate an upload without loading it should override this;
+        by default the dataframe returned by from_upload_to_dataframe is written out.
+
+        :return InterpreterResult: the UploadedFlight and the list of errors
+        """
+        dataframe, errors = self.from_upload_to_dataframe(uploaded_file, datasource_type_id)
+        if errors:
+            return InterpreterResult(None, errors)
+
+        base_file_name = os.path.basename(uploaded_file.filename)
+        tmp_file = os.path.join(TEMPORARY_UPLOAD_FOLDER, f"{int(time.time())}_{base_file_name}")
+        dataframe.astype(np.float32, copy=False).to_hdf(tmp_file, key=HDF5_STORE_INDEX)
+
+        number_of_rows, number_of_columns = dataframe.shape
+        return InterpreterResult(
+            UploadedFlight(tmp_file, f'/{HDF5_STORE_INDEX}', number_of_rows, number_of_columns),
+            errors
+        )
@@ -6,60 +6,82 @@ import pandas as pd
 import numpy as np
 
 from app import services
-from app.interpreters.datasource.base import AbstractDatasourceInterpreter, InterpreterResult
+from app.core.storage import get_hdf_shape
+from app.interpreters.datasource.base import AbstractDatasourceInterpreter, InterpreterResult, UploadedFlight
 from config import TEMPORARY_UPLOAD_FOLDER
 
 
 class FlightDatasourceInterpreter(AbstractDatasourceInterpreter):
 
     MAX_SENSORS = 32
-    
-    def from_upload_to_dataframe(self, uploaded_file, datasource_type_id):
 
-        flight = pd.DataFrame()
+    def from_upload_to_file(self, uploaded_file, datasource_type_id):
+        """
+        Saves the upload in the temporary folder and validates it by looking at the HDF5 metadata only.
+
+        :return InterpreterResult: the UploadedFlight and the list of errors.
+        On errors the temporary file has already been removed.
+        """
         errors = []
         base_file_name = os.path.basename(uploaded_file.filename)
         tmp_file = os.path.join(TEMPORARY_UPLOAD_FOLDER, f"{int(time.time())}_{base_file_name}")
         uploaded_file.save(tmp_file)
 
+        uploaded_flight = None
         try:
             with pd.HDFStore(tmp_file, 'r') as store:
                 flights = list(store.keys())
-                if len(flights) > 1:
+                if len(flights) != 1:
                     errors.append(f"File must contain only one flight. Found {len(flights)}.")
                 else:
-                    flight = store.get(flights[0])
-                    flight = flight.astype(np.float32)
-
-            os.remove(tmp_file)
-        except OSError as e:
-            logging.debug(f"Trying to remove a non existent file {tmp_file}: {e}")
+                    data_size, column_size = get_hdf_shape(store, flights[0])
+                    uploaded_flight = UploadedFlight(tmp_file, flights[0], data_size, column_size)
         except Exception as e:
             errors.append(str(e))
 
+        if not len(errors):
+            datasource_config = services.datasource.get_configuration_by_id(datasource_type_id)
+
+            if int(column_size) != int(datasource_config.meta['number_of_sensors']):
+                errors.append("Wrong number of sensors {} found, {} expected".format(
+                    column_size,
+                    datasource_config.meta['number_of_sensors']
+                ))
+
+            if data_size < column_size:
+                errors.append(f"Wrong data shape (data, sensors) ({data_size}, {column_size})")
+
+        if len(errors):
+            self.cleanup(tmp_file)
+
+        return InterpreterResult(
+            uploaded_flight,
+            errors
+        )
+
+    def from_upload_to_dataframe(self, uploaded_file, datasource_type_id):
+        uploaded_flight, errors = self.from_upload_to_file(uploaded_file, datasource_type_id)
+
         if len(errors):
             return InterpreterResult(
-                flight,
+                pd.DataFrame(),
                 errors
             )
 
-        column_size = len(flight.columns)
-        data_size = len(flight)
-
-        datasource_config = services.datasource.get_configuration_by_id(datasource_type_id)
+        with pd.HDFStore(uploaded_flight.location, 'r') as store:
+            flight = store.get(uploaded_flight.key)
+            flight = flight.astype(np.float32, copy=False)
 
-        if int(column_size) != int(datasource_config.meta['number_of_sensors']):
-            errors.append("Wrong number of sensors {} found, {} expected".format(
-                column_size,
-                datasource_config.meta['number_of_sensors']
-            ))
-
-        if data_size < column_size:
-            errors.append(f"Wrong data shape (data, sensors) ({data_size}, {column_size})")
+        self.cleanup(uploaded_flight.location)
 
         return InterpreterResult(
             flight,
             errors
         )
 
-
+    @staticmethod
+    def cleanup(tmp_file):
+        try:
+            os.remove(tmp_file)
+        except OSError as e:
+            logging.debug(f"Trying to remove a non existent file {tmp_file}: {e}")
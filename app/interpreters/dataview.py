@@ -2,11 +2,72 @@ import pandas as pd
 import numpy as np
 from alphai_watson.detective import DetectionResult
 
+MICROSECONDS_IN_SECOND = 10 ** 6
+MICROSECONDS_IN_DAY = 86400 * MICROSECONDS_IN_SECOND
+
+
+def format_timedelta_labels(index):
+    """
+    Vectorised equivalent of [str(delta.to_pytimedelta()) for delta in index]
+
+    :param pd.TimedeltaIndex index:
+    :return list: the labels, formatted as `[D day[s], ]H:MM:SS[.ffffff]`
+    """
+    microseconds, nanoseconds = np.divmod(index.values.astype(np.int64), 1000)
+    # as timedelta does, round to the nearest microsecond with ties to even
+    microseconds += (nanoseconds > 500) | ((nanoseconds == 500) & (microseconds % 2 == 1))
+
+    days, microseconds = np.divmod(microseconds, MICROSECONDS_IN_DAY)
+    seconds, microseconds = np.divmod(microseconds, MICROSECONDS_IN_SECOND)
+    hours, seconds = np.divmod(seconds, 3600)
+    minutes, seconds = np.divmod(seconds, 60)
+
+    labels = np.char.add(np.char.mod('%d:', hours), np.char.mod('%02d:', minutes))
+    labels = np.char.add(labels, np.char.mod('%02d', seconds))
+
+    with_microseconds = microseconds != 0
+    if with_microseconds.any():
+        labels = np.where(with_microseconds, np.char.add(labels, np.char.mod('.%06d', microseconds)), labels)
+
+    with_days = days != 0
+    if with_days.any():
+        day_labels = np.where(np.abs(days) == 1, np.char.mod('%d day, ', days), np.char.mod('%d days, ', days))
+        labels = np.where(with_days, np.char.add(day_labels, labels), labels)
+
+    return labels.tolist()
+
+
+def data_frame_to_dict(data_frame):
+    """
+    Serialises a dataframe indexed by timedelta for the charts of the data endpoints.
+
+    :param pd.DataFrame data_frame:
+    :return dict: the timedelta labels, and one dataset of values per column
+    """
+    datasets = [
+        {
+            'label': label,
+            'data': data.tolist()
+        }
+        for label, data in zip(data_frame.columns, data_frame.values.T)
+    ]
+
+    return {
+        'labels': format_timedelta_labels(data_frame.index),
+        'datasets': datasets
+    }
+
 
 class DataView:
 
-    def __init__(self, data_frame, sample_rate):
+    def __init__(self, data_frame, sample_rate, offset=0):
+        """
+        :param pd.DataFrame data_frame: the data, one row per timestep
+        :param float sample_rate: the number of rows per second
+        :param float offset: the time in seconds of the first row
+        """
         self._sample_rate = sample_rate
+        self._offset = offset
         self._data_frame = self._add_timedelta_index(data_frame)
 
     @property
@@ -21,7 +82,7 @@ class DataView:
         data_length = data_frame.shape[0]
         duration_in_milliseconds = 1000 / self._sample_rate
         data_frame['timedelta'] = pd.TimedeltaIndex(
-            periods=data_length, start=0, freq=f"{round(duration_in_milliseconds, 6)}L"
+            periods=data_length, start=pd.Timedelta(seconds=self._offset), freq=f"{round(duration_in_milliseconds, 6)}L"
         )
         return data_frame.set_index('timedelta')
 
@@ -51,23 +112,7 @@ class DataView:
         return self.to_dataframe(resample_rule, normalize).to_csv()
 
     def to_dict(self, resample_rule=None, normalize=False):
-        data_frame = self.to_dataframe(resample_rule, normalize)
-
-        datasets = []
-        labels = [str(delta.to_pytimedelta()) for delta in data_frame.index]
-
-        for label, data in data_frame.to_dict().items():
-            datasets.append(
-                {
-                    'label': label,
-                    'data': [value for _, value in data.items()]
-                }
-            )
-
-        return {
-            'labels': labels,
-            'datasets': datasets
-        }
+        return data_frame_to_dict(self.to_dataframe(resample_rule, normalize))
 
     def __add__(self, other_data_view):
 
@@ -94,6 +139,52 @@ class DataView:
             detection_result.sample_rate
         )
 
+    @staticmethod
+    def create_from_flight(datasource, start=None, end=None, sensors=None, max_points=None, statistic='mean'):
+        """
+        Creates a view of a time window of the flight, reading only the requested sensors.
+
+        When the raw timesteps of the window fit in max_points they are read from the flight store,
+        otherwise the finest level of the downsample pyramid which doesn't exceed max_points is used
+        (the finest one if max_points is not specified).
+
+        :param datasource: the flight datasource
+        :param float start: the start of the window in seconds, the flight start if None
+        :param float end: the end of the window in seconds, the flight end if None
+        :param list sensors: the positional indexes of the sensors, all of them if None
+        :param int max_points: the maximum number of points per sensor
+        :param str statistic: the pyramid statistic to use for downsampled windows
+
+        :raises FlightNotPreparedError: if the store or the pyramid of the flight have not been built yet
+        """
+        store = datasource.get_store(build_missing=False)
+        sample_rate = float(datasource.meta['sample_rate'])
+        duration = store.number_of_timesteps / sample_rate
+
+        start = min(max(start or 0, 0), duration)
+        end = duration if end is None else min(max(end, start), duration)
+
+        if sensors is None:
+            sensors = list(range(store.number_of_sensors))
+        if any(sensor < 0 or sensor >= store.number_of_sensors for sensor in sensors):
+            raise ValueError(f"Invalid sensors {sensors}, the flight has {store.number_of_sensors} sensors")
+        columns = [store.columns[sensor] for sensor in sensors]
+
+        first_timestep = int(np.floor(start * sample_rate))
+        last_timestep = int(np.ceil(end * sample_rate))
+
+        if max_points and last_timestep - first_timestep <= max_points:
+            data = store.read_array(first_timestep, last_timestep, columns)
+            return DataView(pd.DataFrame(data.T, columns=columns), sample_rate, first_timestep / sample_rate)
+
+        pyramid = datasource.get_pyramid(build_missing=False)
+        level = pyramid.select_level(end - start, max_points)
+        first_bin = int(np.floor(start / level))
+        last_bin = int(np.ceil(end / level))
+        data = pyramid.read_array(level, statistic, first_bin, last_bin, sensors)
+
+        return DataView(pd.DataFrame(data.T, columns=columns), 1 / level, first_bin * level)
+
     @staticmethod
     def create_from_datasource(datasource):
         return DataView(
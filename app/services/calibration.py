@@ -1,12 +1,16 @@
 # After training a model, we need to establish calibration based on its predictive accuracy
 import logging
-from copy import deepcopy
+import time
+from copy import copy
 from pprint import pformat
 
 import numpy as np
+from alphai_watson.detective import DetectionResult as DetectiveDetectionResult
 from alphai_watson.performance import AnomalyTypes, ResultCollector
 from scipy.optimize import minimize
 
+from config import CALIBRATION_DETECT_BATCH_SIZE
+
 ANOMALY_PRIOR_PERCENTILE = 99
 
 DEFAULT_ANOMALY_PRIOR = 0.5
@@ -51,30 +55,38 @@ def estimate_calibration_parameters(detective, test_data, performance, train_dat
 
     normal_true_value = AnomalyTypes[test_data.type].value
 
-    abnormal_flights = _build_list_of_abnormal_flights(test_data)
+    abnormal_flight_batches = generate_abnormal_flights(test_data, CALIBRATION_DETECT_BATCH_SIZE)
+    number_of_abnormal_flights = len(_get_contaminations())
 
-    raw_perfomance_array = np.zeros(len(abnormal_flights))
-    raw_outputs = np.zeros(len(abnormal_flights))
+    raw_perfomance_array = np.zeros(number_of_abnormal_flights)
+    raw_outputs = np.zeros(number_of_abnormal_flights)
 
     # Establish performance accuracy
-    for i, abnormal_sample in enumerate(abnormal_flights):
-        logging.info(f"Analysing fake abnormal flight {i} data")
+    i = 0
+    for batch_data, abnormal_samples in abnormal_flight_batches:
+        start_time = time.perf_counter()
+        abnormal_detection_results = _detect_batch(detective, test_data, batch_data, abnormal_samples)
+        # a batch is detected with a single call: its flights are timed with the average over the batch
+        detection_time = (time.perf_counter() - start_time) / len(abnormal_samples)
+        timing_note = f" (average over a batch of {len(abnormal_samples)})" if len(abnormal_samples) > 1 else ""
 
-        abnormal_detection_result = detective.detect(abnormal_sample)
-        raw_outputs[i] = np.median(abnormal_detection_result.data)
+        for abnormal_sample, abnormal_detection_result in zip(abnormal_samples, abnormal_detection_results):
+            logging.info(f"Detection for fake abnormal flight {i} took {detection_time:.2f}s{timing_note}")
+            raw_outputs[i] = np.median(abnormal_detection_result.data)
 
-        abnormal_true_value = AnomalyTypes[abnormal_sample.type].value
+            abnormal_true_value = AnomalyTypes[abnormal_sample.type].value
 
-        result_collector = ResultCollector()
-        result_collector.add_result(0, abnormal_detection_result, abnormal_true_value)
-        result_collector.add_result(1, normal_detection_result, normal_true_value)
+            result_collector = ResultCollector()
+            result_collector.add_result(0, abnormal_detection_result, abnormal_true_value)
+            result_collector.add_result(1, normal_detection_result, normal_true_value)
 
-        logging.info(f"Detecting score for fake abnormal flight {i} data")
+            logging.info(f"Detecting score for fake abnormal flight {i} data")
 
-        chunk_roc_score = performance.analyse(result_collector.chunk_score, result_collector.chunk_true_value)
-        logging.info(f"RAW ROC score for flight {i} was:")
-        logging.info(pformat(chunk_roc_score))
-        raw_perfomance_array[i] = np.abs(chunk_roc_score - 0.5) + 0.5  # Deviation from 0.5 corresponds to enhanced performance
+            chunk_roc_score = performance.analyse(result_collector.chunk_score, result_collector.chunk_true_value)
+            logging.info(f"RAW ROC score for flight {i} was:")
+            logging.info(pformat(chunk_roc_score))
+            raw_perfomance_array[i] = np.abs(chunk_roc_score - 0.5) + 0.5  # Deviation from 0.5 corresponds to enhanced performance
+            i += 1
 
     logging.info(f"RAW Performance array for calibration:")
     logging.info(pformat(raw_perfomance_array))
@@ -103,51 +115,115 @@ def estimate_calibration_parameters(detective, test_data, performance, train_dat
     return k, x0, anomaly_prior
 
 
-def _build_list_of_abnormal_flights(test_data):
-    total_samples = []
+def _get_contaminations():
+    """ The (contamination function, parameter) used to build every abnormal flight """
+    return (
+        [(_add_amplitude_contamination, amplitude) for amplitude in ANOMALY_CONTAMINATION_AMPLITUDES] +
+        [(_add_timeshift_contamination, time_shift) for time_shift in ANOMALY_TIME_SHIFT] +
+        [(_add_multiplicative_contamination, factor) for factor in ANOMALY_MULTIPLICATIVE_FACTOR]
+    )
+
+
+def _create_abnormal_sample(test_data, data):
+    abnormal_sample = copy(test_data)
+    abnormal_sample.data = data
+    abnormal_sample.type = 'ABNORMAL'
+    return abnormal_sample
+
+
+def generate_abnormal_flights(test_data, batch_size=1):
+    """
+    Yields the abnormal flights built out of the test data, batch_size at a time, without copying the sample.
+
+    Every batch is written in the same preallocated buffer of shape [batch_size, *test_data.data.shape],
+    so a batch is overwritten by the next one and has to be used before asking for it.
+    The memory needed is batch_size times the test data, whatever the number of contaminations.
+
+    :return generator: (batch data of shape [n_flights_in_batch, *test_data.data.shape], list of abnormal Samples)
+    where the data of every Sample is a view of the batch data
+    """
+    contaminations = _get_contaminations()
+    buffer = np.empty((min(batch_size, len(contaminations)),) + test_data.data.shape, dtype=test_data.data.dtype)
+
+    for start in range(0, len(contaminations), batch_size):
+        batch_contaminations = contaminations[start:start + batch_size]
+        batch_data = buffer[:len(batch_contaminations)]
+
+        abnormal_samples = []
+        for (contaminate, parameter), data in zip(batch_contaminations, batch_data):
+            start_time = time.perf_counter()
+            contaminate(test_data.data, parameter, out=data)
+            logging.debug(f"Built {contaminate.__name__} {parameter} in {time.perf_counter() - start_time:.2f}s")
+            abnormal_samples.append(_create_abnormal_sample(test_data, data))
+
+        yield batch_data, abnormal_samples
+
+
+def _detect_batch(detective, test_data, batch_data, abnormal_samples):
+    """
+    Runs the detection of a batch of abnormal flights with a single detect call on their chunks,
+    falling back to a call per flight if the scores can't be split per flight.
+
+    :return list: a DetectionResult for each abnormal sample
+    """
+    if len(abnormal_samples) > 1:
+        batch_sample = _create_abnormal_sample(test_data, batch_data.reshape((-1,) + batch_data.shape[2:]))
+        batch_result = detective.detect(batch_sample)
+        scores = np.asarray(batch_result.data)
+
+        if scores.shape[0] == batch_data.shape[0] * batch_data.shape[1]:
+            return [
+                DetectiveDetectionResult(
+                    flight_scores,
+                    batch_result._number_timesteps_in_chunk,
+                    batch_result.original_sample_rate
+                )
+                for flight_scores in np.split(scores, len(abnormal_samples))
+            ]
+
+        logging.info(f"Can't split the detection scores of shape {scores.shape}, detecting one flight at a time")
+
+    return [detective.detect(abnormal_sample) for abnormal_sample in abnormal_samples]
 
-    # apply contamination amplitudes
-    for i in range(len(ANOMALY_CONTAMINATION_AMPLITUDES)):
-        amplitude = ANOMALY_CONTAMINATION_AMPLITUDES[i]
-        new_test_data = deepcopy(test_data)
-        new_test_data.data = _add_amplitude_contamination(test_data.data, amplitude)
-        new_test_data.type = 'ABNORMAL'
-        total_samples.append(new_test_data)
 
-    # apply time_shift anomaly
-    for i in range(len(ANOMALY_TIME_SHIFT)):
-        time_shift = ANOMALY_TIME_SHIFT[i]
-        new_test_data = deepcopy(test_data)
-        new_test_data.data = _add_timeshift_contamination(test_data.data, time_shift)
-        new_test_data.type = 'ABNORMAL'
-        total_samples.append(new_test_data)
+def _roll(original_flight, shift, axis, out):
+    """ np.roll of original_flight along axis, written in out """
+    shift %= original_flight.shape[axis]
+    source = [slice(None)] * original_flight.ndim
+    target = [slice(None)] * original_flight.ndim
 
-    # apply multiplicative anomaly
-    for i in range(len(ANOMALY_MULTIPLICATIVE_FACTOR)):
-        multiplicative_factor = ANOMALY_MULTIPLICATIVE_FACTOR[i]
-        new_test_data = deepcopy(test_data)
-        new_test_data.data = _add_multiplicative_contamination(test_data.data, multiplicative_factor)
-        new_test_data.type = 'ABNORMAL'
-        total_samples.append(new_test_data)
+    source[axis], target[axis] = slice(None, original_flight.shape[axis] - shift), slice(shift, None)
+    out[tuple(target)] = original_flight[tuple(source)]
+    source[axis], target[axis] = slice(original_flight.shape[axis] - shift, None), slice(None, shift)
+    out[tuple(target)] = original_flight[tuple(source)]
 
-    return total_samples
+    return out
 
 
-def _add_amplitude_contamination(original_flight, abnormality_fraction):
-    contamination = np.roll(original_flight, shift=1, axis=N_SENSORS_INDEX)
+def _add_amplitude_contamination(original_flight, abnormality_fraction, out=None):
+    if out is None:
+        out = np.empty_like(original_flight)
+    contamination = _roll(original_flight, shift=1, axis=N_SENSORS_INDEX, out=out)
+    contamination *= abnormality_fraction
+    contamination += original_flight
+    contamination /= (1.0 + abnormality_fraction)
 
-    return (original_flight + abnormality_fraction * contamination) / (1.0 + abnormality_fraction)
+    return contamination
 
 
-def _add_timeshift_contamination(original_flight, timeshift_percentage):
+def _add_timeshift_contamination(original_flight, timeshift_percentage, out=None):
+    if out is None:
+        out = np.empty_like(original_flight)
     places_to_shift = int(original_flight.shape[1] * timeshift_percentage)
-    contamination = np.roll(original_flight, shift=places_to_shift, axis=1)
+    contamination = _roll(original_flight, shift=places_to_shift, axis=1, out=out)
+    contamination += original_flight
+    contamination /= 2
 
-    return (original_flight + contamination) / 2
+    return contamination
 
 
-def _add_multiplicative_contamination(original_flight, multiplication_factor):
-    return original_flight * multiplication_factor
+def _add_multiplicative_contamination(original_flight, multiplication_factor, out=None):
+    return np.multiply(original_flight, multiplication_factor, out=out)
 
 
 def _calibration_cost(constants, raw_outputs, performance_array):
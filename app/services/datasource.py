@@ -1,8 +1,10 @@
 import os
 
 from app.core.models import DataSource
+from app.core.storage import open_flight_pyramid
 from app.entities import DataSourceEntity
 from app.entities.datasource import UploadTypes, DataSourceConfigurationEntity
+from app.tasks.prepare_flight import prepare_flight_celery_task
 
 
 def get_by_upload_code(upload_code):
@@ -44,6 +46,19 @@ def get_dataframe(datasource):
     return model.get_file()
 
 
+def prepare_flight(datasource):
+    """ Builds the store and the downsample pyramid of the flight, if they're missing """
+    datasource.get_pyramid(build_missing=True)
+
+
+def trigger_flight_preparation(datasource):
+    """
+    Enqueues the conversion of a flight uploaded before the store and the pyramid existed.
+    The conversion is idempotent, so a flight requested again while it's converted is harmless.
+    """
+    prepare_flight_celery_task.apply_async((datasource.upload_code,))
+
+
 def get_configuration_by_id(id):
     model = DataSourceConfigurationEntity.get_for_id(id)
     return model
@@ -53,12 +68,19 @@ def get_configuration_by_company_id(company_id):
     return DataSourceConfigurationEntity.get_for_company_id(company_id).all()
 
 
-def save_datasource(name, company_id, datasource_configuration_id, upload_code, upload_manager, uploaded_dataframe,
+def save_datasource(name, company_id, datasource_configuration_id, upload_code, upload_manager, uploaded_data,
                     user):
     datasource_configuration = get_configuration_by_id(datasource_configuration_id)
     if not datasource_configuration:
         raise Exception(f"No datasource configuration available for {datasource_configuration_id}")
-    saved_path = upload_manager.store(uploaded_dataframe, company_id, upload_code)
+    saved_path = upload_manager.store(uploaded_data, company_id, upload_code)
+    try:
+        # the downsampled views of the flight are computed once, at upload time
+        open_flight_pyramid(saved_path, float(datasource_configuration.meta['sample_rate']))
+    except Exception:
+        # the flight has already been moved in place: remove it with its store and pyramid files
+        upload_manager.cleanup(saved_path)
+        raise
 
     upload = DataSource(
         user_id=user.id,
@@ -1,5 +1,10 @@
+import glob
+import hashlib
+import json
 import logging
+import os
 import uuid
+import zlib
 
 import numpy as np
 from alphai_watson.detective import DetectionResult as DetectiveDetectionResult
@@ -7,7 +12,10 @@ from attribdict import AttribDict
 
 from app import services
 from app.core.models import DetectionTask, DetectionResult, DetectionTaskStatus
+from app.core.storage import replace_atomically
+from app.core.utils import json_reload, request_memoize
 from app.entities import DetectionTaskEntity, DetectionResultEntity, TaskStatusTypes
+from config import PROBABILITIES_CACHE_FOLDER
 
 
 def get_task_by_code(task_code):
@@ -25,6 +33,12 @@ def get_result_by_code(task_code):
     return DetectionResult.from_model(model)
 
 
+def get_results_for_company(company_id):
+    models = DetectionResultEntity.query.filter(
+        DetectionResultEntity.company_id == company_id).order_by(DetectionResultEntity.id).all()
+    return DetectionResult.from_models(*models)
+
+
 def get_tasks_by_company_id(company_id):
     return DetectionTaskEntity.query.filter(DetectionTaskEntity.company_id == company_id).order_by(
         DetectionTaskEntity.created_at.desc()).all()
@@ -112,9 +126,71 @@ def trigger_detection(detection_name, datasource, training_task, user_id):
 
 def delete(detection_task):
     model = detection_task._model
+    delete_cached_probabilities(detection_task.task_code)
     model.delete()
 
 
+def serialize_watson_detection_result(detection_result):
+    """
+    Splits a watson DetectionResult in the json metadata and the compressed scores to store.
+
+    :param DetectiveDetectionResult detection_result:
+    :return tuple: (dict, bytes)
+    """
+    scores = np.ascontiguousarray(detection_result.data)
+    metadata = {
+        'original_sample_rate': detection_result.original_sample_rate,
+        'timesteps_per_chunk': detection_result._number_timesteps_in_chunk,
+        'dtype': scores.dtype.str,
+        'shape': list(scores.shape),
+    }
+    return json_reload(metadata), zlib.compress(scores.tobytes())
+
+
+def deserialize_scores(metadata, scores):
+    """
+    Rebuilds the scores array stored by serialize_watson_detection_result.
+    The returned array is a read-only view on the decompressed buffer.
+    """
+    return np.frombuffer(zlib.decompress(scores), dtype=metadata['dtype']).reshape(metadata['shape'])
+
+
+@request_memoize('detection_result')
+def create_watson_detection_result(detection_result):
+    """
+    Creates the watson DetectionResult out of a stored detection result.
+    It's built once per request, the returned object must not be modified.
+
+    :param detection_result: a DetectionResult or a DetectionResultEntity
+    :return DetectiveDetectionResult:
+    """
+    model = getattr(detection_result, '_model', detection_result)
+    if model.scores is None:
+        # results stored before the scores were saved as binary
+        return create_watson_detection_result_from_dictionary(model.result)
+
+    return DetectiveDetectionResult(
+        deserialize_scores(model.result, model.scores),
+        model.result['timesteps_per_chunk'],
+        model.result['original_sample_rate']
+    )
+
+
+def add_scores_to_result(detection_result):
+    """
+    Returns the json result of a stored detection with the scores under `data`,
+    as the api served it before they were stored as binary.
+
+    :param detection_result: a DetectionResult or a DetectionResultEntity
+    :return dict:
+    """
+    model = getattr(detection_result, '_model', detection_result)
+    if model.scores is None:
+        return model.result
+
+    return dict(model.result, data=deserialize_scores(model.result, model.scores))
+
+
 def create_watson_detection_result_from_dictionary(detection_result_json):
     detection_result = AttribDict(detection_result_json)
 
@@ -125,10 +201,10 @@ def create_watson_detection_result_from_dictionary(detection_result_json):
     )
 
 
+@request_memoize('calibration')
 def load_calibration_values(detection_task):
-    task_code = detection_task.task_code
-    task = services.detection.get_task_by_code(task_code)
-    calibration = task._model.training_task.configuration.get('calibration')
+    model = getattr(detection_task, '_model', detection_task)
+    calibration = model.training_task.configuration.get('calibration')
     if calibration:
         k = calibration.get('k')
         x0 = calibration.get('x0')
@@ -142,3 +218,77 @@ def load_calibration_values(detection_task):
 
 def filter_by_company_id(query, company_id):
     return query.filter(DetectionTaskEntity.company_id == company_id).order_by(DetectionTaskEntity.created_at.desc())
+
+
+def calculate_probabilities(detection_result, k=None, x0=None, anomaly_prior=None):
+    if k and x0 and anomaly_prior:
+        return detection_result.get_probabilities(anomaly_prior=anomaly_prior, k=k, x0=x0)
+    return detection_result.get_probabilities()
+
+
+def get_probabilities_cache_location(task_code, calibration):
+    """
+    The cached probabilities are keyed by the task code and by a hash of the calibration values,
+    so that a new calibration never reads the probabilities computed with the old one.
+    """
+    calibration_version = hashlib.sha1(json.dumps(list(calibration), default=float).encode('utf-8')).hexdigest()
+    return os.path.join(PROBABILITIES_CACHE_FOLDER, f"{task_code}_{calibration_version[:12]}.npz")
+
+
+def cache_probabilities(detection_task, detection_result):
+    """
+    Computes the calibrated probabilities of a watson DetectionResult and stores them for detection_task.
+
+    :return tuple: (np.ndarray of probabilities, sample rate)
+    """
+    calibration = load_calibration_values(detection_task)
+    probabilities = np.asarray(calculate_probabilities(detection_result, *calibration))
+    sample_rate = detection_result.sample_rate
+
+    location = get_probabilities_cache_location(detection_task.task_code, calibration)
+
+    def write_cache(temporary_location):
+        with open(temporary_location, 'wb') as cache_file:
+            np.savez(cache_file, probabilities=probabilities, sample_rate=sample_rate)
+
+    try:
+        os.makedirs(PROBABILITIES_CACHE_FOLDER, exist_ok=True)
+        replace_atomically(location, write_cache)
+    except OSError as e:
+        logging.warning(f"Unable to cache the probabilities for {detection_task.task_code}: {e}")
+    else:
+        # the probabilities computed with a previous calibration can't be read anymore
+        delete_cached_probabilities(detection_task.task_code, keep=location)
+
+    return probabilities, sample_rate
+
+
+def get_calibrated_probabilities(detection_task):
+    """
+    Returns the calibrated anomaly probabilities of a detection and their sample rate,
+    computing them out of the stored result only if they're not in the cache.
+
+    :param detection_task: a DetectionTask or a DetectionTaskEntity
+    :return tuple: (np.ndarray of probabilities, sample rate)
+    """
+    location = get_probabilities_cache_location(detection_task.task_code, load_calibration_values(detection_task))
+    try:
+        with np.load(location) as cached:
+            return cached['probabilities'], cached['sample_rate'].item()
+    except (OSError, ValueError, KeyError):
+        logging.debug(f"No cached probabilities for {detection_task.task_code}")
+
+    model = getattr(detection_task, '_model', detection_task)
+    detection_result = create_watson_detection_result(model.detection_result)
+    return cache_probabilities(detection_task, detection_result)
+
+
+def delete_cached_probabilities(task_code, keep=None):
+    """ Removes the probabilities cached for task_code, but the ones at keep """
+    for location in glob.glob(os.path.join(PROBABILITIES_CACHE_FOLDER, f"{task_code}_*.npz")):
+        if location == keep:
+            continue
+        try:
+            os.remove(location)
+        except OSError:
+            logging.debug(f"Trying to remove the non existent cache file {location}")
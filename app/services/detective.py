@@ -1,6 +1,12 @@
+import glob
 import logging
+import os
+from collections import OrderedDict
 
 from app.core.utils import import_class
+from config import DETECTIVE_CACHE_SIZE
+
+_detective_cache = OrderedDict()
 
 
 def create_detective_from_configuration(entity_with_configuration):
@@ -42,3 +48,43 @@ def set_correct_load_path_for_detection_and_diagnose(entity_with_configuration):
     logging.info(f"new load_path {save_path}")
 
     return entity_with_configuration
+
+
+def get_checkpoint_modification_time(entity_with_configuration):
+    """
+    The latest modification time of the files of the checkpoint in the model load_path, None if there aren't any.
+    """
+    load_path = entity_with_configuration.configuration['model']['configuration']['model_configuration']['load_path']
+    modification_times = [os.path.getmtime(location) for location in glob.glob(f"{load_path}*")]
+    return max(modification_times) if modification_times else None
+
+
+def get_detective(training_task):
+    """
+    Returns the detective of a training, ready for detection and diagnose.
+
+    Restored detectives are kept in an in-process LRU cache of DETECTIVE_CACHE_SIZE entries, keyed by the
+    training task code and the checkpoint modification time, so a worker restores every model only once.
+
+    :param training_task: the training entity, with the load_path already set to the full checkpoint path
+    """
+    key = (training_task.task_code, get_checkpoint_modification_time(training_task))
+
+    if key in _detective_cache:
+        logging.info(f"Using the cached detective for {training_task.task_code}")
+        _detective_cache.move_to_end(key)
+        return _detective_cache[key]
+
+    detective = create_detective_from_configuration(training_task)
+    if DETECTIVE_CACHE_SIZE > 0:
+        for cached_key in [cached_key for cached_key in _detective_cache if cached_key[0] == training_task.task_code]:
+            del _detective_cache[cached_key]
+        _detective_cache[key] = detective
+        while len(_detective_cache) > DETECTIVE_CACHE_SIZE:
+            _detective_cache.popitem(last=False)
+
+    return detective
+
+
+def clear_detective_cache():
+    _detective_cache.clear()
@@ -1,19 +1,25 @@
+import hashlib
+import json
 import logging
 import math
 import operator
-from datetime import timedelta
 
 import numpy as np
+import pandas as pd
 
 from app import services
 from app.core.models import DiagnosticTask, DiagnosticResult
+from app.core.utils import json_reload
 from app.entities import TaskStatusTypes
 from app.entities.diagnostic import DiagnosticTaskEntity, DiagnosticTaskStatusEntity
+from app.interpreters.dataview import DataView, format_timedelta_labels
+from app.services.transformer import SimpleTransformer, ResampleMethod
 from alphai_watson.detective import DiagnosticResult as DetectiveDiagnosticResult
 
-from app.interpreters.dataview import DataView
 from app.tasks.diagnose import diagnose_celery_task
-from config import DEFAULT_VIEW_TIME_RESAMPLE_RULE
+from config import DIAGNOSTIC_RADIUS, DIAGNOSTIC_NUMBER_OF_HOTSPOTS, BATCHED_DIAGNOSTIC
+
+PLOT_DATA_KEYS = ('diagnostic', 'original', 'synthetic')
 
 
 def get_task_by_code(detection_task_code):
@@ -41,7 +47,7 @@ def save_result(diagnostic_result):
     return DiagnosticResult.from_model(model)
 
 
-def trigger_diagnostic(detection_task, upload_code):
+def create_diagnostic_task(detection_task, upload_code, message=None):
     detection_task_code = detection_task.task_code
 
     diagnostic_task_entity = DiagnosticTaskEntity(
@@ -56,14 +62,59 @@ def trigger_diagnostic(detection_task, upload_code):
     status = DiagnosticTaskStatusEntity(
         diagnostic_task_id=diagnostic_task_entity.id,
         state=TaskStatusTypes.queued.value,
-        message=f'Diagnostic for {detection_task_code} has been enqueued'
+        message=message or f'Diagnostic for {detection_task_code} has been enqueued'
     )
     status.save()
-    diagnose_celery_task.apply_async((upload_code, detection_task_code))
 
     return diagnostic_task_entity
 
 
+def trigger_diagnostic(detection_task, upload_code):
+    diagnostic_task_entity = create_diagnostic_task(detection_task, upload_code)
+    diagnose_celery_task.apply_async((upload_code, detection_task.task_code))
+
+    return diagnostic_task_entity
+
+
+def run_diagnostic(diagnostic_task, uploaded_file, sample, detective):
+    """
+    Diagnoses the most anomalous chunks of a flight and stores the result.
+
+    :param DiagnosticTask diagnostic_task:
+    :param DataSource uploaded_file: the flight of the detection
+    :param sample: the watson Sample of the flight, processed with the training transformer
+    :param detective: the detective restored from the training checkpoint
+    """
+    task_code = diagnostic_task.task_code
+    set_task_status(
+        task_id=diagnostic_task.id,
+        status=TaskStatusTypes.started,
+        message=f'Diagnostic for {task_code} has started!'
+    )
+
+    chunk_list = calculate_most_anomalous_chunks(diagnostic_task)
+    results = json_reload(diagnose_chunks(detective, sample, chunk_list))
+    plot = create_plot_payload(diagnostic_task, results)
+
+    save_result(
+        DiagnosticResult(
+            company_id=uploaded_file.company_id,
+            diagnostic_task_id=diagnostic_task.id,
+            upload_code=uploaded_file.upload_code,
+            task_code=task_code,
+            result=results,
+            plot=plot,
+            plot_digest=digest_plot_payload(plot)
+        )
+    )
+
+    set_task_status(
+        task_id=diagnostic_task.id,
+        status=TaskStatusTypes.successful,
+        message=f'Diagnostic for {task_code} has completed successfully!'
+    )
+
+
 def create_result_from_json(json_data):
     return DetectiveDiagnosticResult(
         chunk_index=json_data['chunk_index'],
@@ -73,59 +124,189 @@ def create_result_from_json(json_data):
     )
 
 
-def calculate_most_anomalous_chunks(diagnostic_task, radius=1):
+def find_most_anomalous_windows(probabilities, radius=1, number_of_windows=1):
+    """
+    Finds the most anomalous disjoint windows of 2 * radius + 1 chunks.
+
+    Every window is centred on a chunk which is the maximum of its own neighbourhood,
+    and the windows are ranked by the probability of that chunk.
+
+    :param np.ndarray probabilities: the anomaly probability of every chunk
+    :param int radius: the number of chunks on each side of the centre of a window
+    :param int number_of_windows: the maximum number of windows to return
+
+    :return list: a range of chunk indexes for each window, the most anomalous first
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64).ravel()
+    number_of_chunks = len(probabilities)
+    if not number_of_chunks or number_of_windows < 1:
+        return []
+
+    window_size = min(2 * radius + 1, number_of_chunks)
+    # chunks without a probability are never the centre of a window, nor hide their neighbours
+    padded = np.pad(np.where(np.isnan(probabilities), -np.inf, probabilities), radius,
+                    mode='constant', constant_values=-np.inf)
+    windowed_maxima = np.lib.stride_tricks.as_strided(
+        padded, shape=(number_of_chunks, 2 * radius + 1), strides=(padded.strides[0], padded.strides[0])
+    ).max(axis=1)
+
+    candidates = np.flatnonzero(probabilities == windowed_maxima)
+    if not len(candidates):
+        return []
+
+    number_of_candidates = min(len(candidates), number_of_windows * window_size)
+    top_candidates = np.argpartition(-probabilities[candidates], number_of_candidates - 1)[:number_of_candidates]
+    top_candidates = candidates[top_candidates[np.argsort(-probabilities[candidates[top_candidates]], kind='mergesort')]]
+
+    windows = []
+    taken = np.zeros(number_of_chunks, dtype=bool)
+    for centre in top_candidates:
+        start = min(max(centre - radius, 0), number_of_chunks - window_size)
+        window = range(int(start), int(start) + window_size)
+        if taken[window.start:window.stop].any():
+            continue
+        taken[window.start:window.stop] = True
+        windows.append(window)
+        if len(windows) == number_of_windows:
+            break
+
+    return windows
+
+
+def calculate_most_anomalous_chunks(diagnostic_task, radius=DIAGNOSTIC_RADIUS,
+                                    number_of_hotspots=DIAGNOSTIC_NUMBER_OF_HOTSPOTS):
+    """
+    :return list: the sorted indexes of the chunks in the most anomalous windows of the detection
+    """
     detection_task = diagnostic_task._model.detection_task
-    detection_result = services.detection.create_watson_detection_result_from_dictionary(
-        detection_task.detection_result.result)
+    probabilities, _ = services.detection.get_calibrated_probabilities(detection_task)
 
-    k, x0, anomaly_prior = services.detection.load_calibration_values(detection_task)
+    windows = find_most_anomalous_windows(probabilities, radius, number_of_hotspots)
+    list_of_chunk_indexes = sorted(chunk_index for window in windows for chunk_index in window)
 
-    data_view = DataView.create_from_detection_result(detection_result, k, x0, anomaly_prior=anomaly_prior)
+    logging.info("Found chunks list [{}]".format(",".join(map(str, list_of_chunk_indexes))))
 
-    original = data_view.to_dataframe()
-    resampled = data_view.to_dataframe(DEFAULT_VIEW_TIME_RESAMPLE_RULE)
+    return list_of_chunk_indexes
 
-    anomalous_chunk_in_resampled = resampled.idxmax()[0]
-    filter_start = anomalous_chunk_in_resampled - timedelta(seconds=1)
-    filter_ends = anomalous_chunk_in_resampled + timedelta(seconds=1)
 
-    anomalous_neighborhood = original.loc[filter_start:filter_ends]
-    max_anomalous_value = anomalous_neighborhood.max().values[0]
+def ensure_dimension(data):
+    if len(data.shape) == 1:
+        data = data.reshape(1, data.shape[0])
 
-    if k and x0 and anomaly_prior:
-        probabilities = detection_result.get_probabilities(anomaly_prior=anomaly_prior, k=k, x0=x0)
-    else:
-        probabilities = detection_result.get_probabilities()
+    return data
 
-    most_anomalous_idx = [a for a in probabilities].index(max_anomalous_value)
 
-    most_anomalous_idx = max(most_anomalous_idx, 1)
+def diagnose_chunks(detective, sample, chunk_list, batched=BATCHED_DIAGNOSTIC):
+    """
+    Diagnoses the chunks of a sample one at a time or, when batched, with a single call to the detective
+    on the chunks stacked in an array of shape [n_chunks, n_sensors, n_timesteps].
 
-    start = most_anomalous_idx - radius
-    end = most_anomalous_idx + radius
-    list_of_chunk_indexes = list(range(start, end + 1))
+    :param detective: the watson detective
+    :param sample: the watson Sample of the flight
+    :param list chunk_list: the indexes of the chunks to diagnose
+    :param bool batched: whether the detective diagnoses a batch of chunks at once, see BATCHED_DIAGNOSTIC
 
-    logging.info("Found chunks list [{}]".format(",".join(map(str, list_of_chunk_indexes))))
+    :return list: a DetectiveDiagnosticResult for each chunk
+    """
+    if not batched:
+        results = []
+        for chunk_index in chunk_list:
+            chunk = sample.get_chunk(chunk_index)
+            synthetic = detective.diagnose(chunk)
+            results.append(DetectiveDiagnosticResult(
+                chunk_index,
+                sample.get_timedelta_for_chunk(chunk_index),
+                ensure_dimension(synthetic),
+                ensure_dimension(chunk)
+            ))
+        return results
+
+    if not len(chunk_list):
+        return []
+
+    chunks = [ensure_dimension(sample.get_chunk(chunk_index)) for chunk_index in chunk_list]
+    synthetic = np.asarray(detective.diagnose(np.stack(chunks)))
+    if synthetic.ndim < 2 or synthetic.shape[0] != len(chunks):
+        raise ValueError(
+            f"The detective returned a diagnosis of shape {synthetic.shape} for a batch of {len(chunks)} chunks: "
+            f"disable BATCHED_DIAGNOSTIC for detectives which diagnose one chunk at a time"
+        )
 
-    return list_of_chunk_indexes
+    return [
+        DetectiveDiagnosticResult(
+            chunk_index,
+            sample.get_timedelta_for_chunk(chunk_index),
+            ensure_dimension(synthetic_chunk),
+            chunk
+        )
+        for chunk_index, chunk, synthetic_chunk in zip(chunk_list, chunks, synthetic)
+    ]
 
 
-def group_adjacent_chunks(raw_diagnostic_result):
-    group_list = []
-    sorted_result = sorted(raw_diagnostic_result, key=lambda k: k['chunk_index'])
+def stack_diagnostic_result(raw_diagnostic_result):
+    """
+    Converts the json serialised diagnostic result into contiguous arrays, sorted by chunk index.
 
-    adjacent_chunk_group = AdjacentChunkList()
-    group_list.append(adjacent_chunk_group)
+    :param list raw_diagnostic_result: the json serialised DiagnosticResult of each chunk
+    :return tuple: (chunk indexes, chunk timedeltas, original [n_chunks, n_sensors, n_timesteps],
+     synthetic [n_chunks, n_sensors, n_timesteps])
+    """
+    sorted_result = sorted(raw_diagnostic_result, key=operator.itemgetter('chunk_index'))
+
+    return (
+        np.array([result['chunk_index'] for result in sorted_result], dtype=np.int64),
+        [result['chunk_timedelta'] for result in sorted_result],
+        np.array([result['original'] for result in sorted_result], dtype=np.float64),
+        np.array([result['synthetic'] for result in sorted_result], dtype=np.float64),
+    )
 
-    for result in sorted_result:
 
-        if not adjacent_chunk_group.can_be_added(result):
-            adjacent_chunk_group = AdjacentChunkList()
-            group_list.append(adjacent_chunk_group)
+def find_adjacent_runs(chunk_indexes):
+    """
+    Finds the runs of consecutive chunk indexes.
 
-        adjacent_chunk_group.add_result(result)
+    :param np.ndarray chunk_indexes: the sorted chunk indexes
+    :return list: the (start, stop) positions of each run in chunk_indexes
+    """
+    if not len(chunk_indexes):
+        return []
 
-    return group_list
+    breaks = np.flatnonzero(np.diff(chunk_indexes) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    stops = np.concatenate((breaks, [len(chunk_indexes)]))
+
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def group_diagnostic_result(chunk_indexes, chunk_timedeltas, original, synthetic):
+    """
+    Joins every run of consecutive chunks into a single DiagnosticResult, see stack_diagnostic_result for the arguments.
+
+    :return list: a DiagnosticResult of shape [n_sensors, n_chunks_in_run * n_timesteps] for each run
+    """
+    return [
+        DetectiveDiagnosticResult(
+            int(chunk_indexes[start]),
+            chunk_timedeltas[start],
+            np.concatenate(synthetic[start:stop], axis=1),
+            np.concatenate(original[start:stop], axis=1)
+        )
+        for start, stop in find_adjacent_runs(chunk_indexes)
+    ]
+
+
+def group_adjacent_chunks(raw_diagnostic_result):
+    sorted_result = sorted(raw_diagnostic_result, key=operator.itemgetter('chunk_index'))
+    chunk_indexes = np.array([result['chunk_index'] for result in sorted_result], dtype=np.int64)
+
+    group_list = []
+    for start, stop in find_adjacent_runs(chunk_indexes):
+        adjacent_chunk_group = AdjacentChunkList()
+        adjacent_chunk_group.list = sorted_result[start:stop]
+        adjacent_chunk_group.latest_index = sorted_result[stop - 1]['chunk_index']
+        group_list.append(adjacent_chunk_group)
+
+    return group_list or [AdjacentChunkList()]
 
 
 class AdjacentChunkList:
@@ -136,7 +317,7 @@ class AdjacentChunkList:
 
     def can_be_added(self, result):
 
-        if not self.latest_index:
+        if self.latest_index is None:
             return True
         if result['chunk_index'] == (self.latest_index + 1):
             return True
@@ -151,37 +332,182 @@ class AdjacentChunkList:
         if len(self.list):
             first_element = self.list[0]
 
-            chunk_index = first_element['chunk_index']
-            chunk_timedelta = first_element['chunk_timedelta']
+            original = np.array([result['original'] for result in self.list], dtype=np.float64)
+            synthetic = np.array([result['synthetic'] for result in self.list], dtype=np.float64)
 
-            original_shape = np.array(first_element['original']).shape
-            cumulative_original = np.zeros((original_shape[0], original_shape[1] * len(self.list)))
+            return DetectiveDiagnosticResult(
+                first_element['chunk_index'],
+                first_element['chunk_timedelta'],
+                np.concatenate(synthetic, axis=1),
+                np.concatenate(original, axis=1)
+            )
 
-            synthetic_shape = np.array(first_element['synthetic']).shape
-            cumulative_synthetic = np.zeros((synthetic_shape[0], synthetic_shape[1] * len(self.list)))
 
-            offset_x = 0
-            for result in self.list:
-                current_original = np.array(result['original'])
+def get_chunk_timedelta(diagnostic_task, chunk_index, number_of_timesteps, sample_rate):
+    """
+    Returns the offset of the chunk from the start of the flight, as stored in the diagnostic
+    result when the chunk has been diagnosed, else out of its position in the flight.
+    """
+    diagnostic_result = diagnostic_task.diagnostic_result
+    if diagnostic_result:
+        for result in diagnostic_result.result:
+            if result['chunk_index'] == chunk_index:
+                return pd.Timedelta(result['chunk_timedelta'])
+
+    return pd.Timedelta(seconds=chunk_index * number_of_timesteps / sample_rate)
+
+
+def get_chunk_envelope(diagnostic_task, uploaded_file, chunk_index, sensor_id):
+    """
+    Downsamples one chunk of one sensor with every ResampleMethod, reading only the rows
+    of the chunk out of the flight store instead of processing the whole flight.
+
+    :param DiagnosticTask diagnostic_task:
+    :param DataSource uploaded_file: the diagnosed flight
+    :param int chunk_index: the position of the chunk in the flight
+    :param int sensor_id: the position of the sensor in the flight
+
+    :return tuple: (dataframe with a mean, max and min column, chunk timedelta)
+    :raises FlightNotPreparedError: if the store of the flight has not been built yet
+    """
+    training_task = diagnostic_task._model.detection_task.training_task
+    transformer = SimpleTransformer.create_from_original_transformer(
+        services.watson.create_transformer_from_configuration(training_task), ResampleMethod.MEAN
+    )
+    number_of_timesteps = transformer.number_of_timesteps
 
-                offset_y = offset_x * current_original.shape[1]
-                offset_z = offset_y + current_original.shape[1]
-                cumulative_original[:, offset_y:offset_z] = current_original[:]
+    store = uploaded_file.get_store(build_missing=False)
+    number_of_chunks = store.number_of_timesteps // number_of_timesteps
+    if not 0 <= chunk_index < number_of_chunks:
+        raise ValueError(f"Chunk {chunk_index} is out of range, the flight has {number_of_chunks} chunks")
+    if not 0 <= sensor_id < store.number_of_sensors:
+        raise ValueError(f"Sensor {sensor_id} is out of range, the flight has {store.number_of_sensors} sensors")
 
-                current_synthetic = np.array(result['synthetic'])
-                offset_y = offset_x * current_synthetic.shape[1]
-                offset_z = offset_y + current_synthetic.shape[1]
+    start = chunk_index * number_of_timesteps
+    chunk = store.read_array(start, start + number_of_timesteps, [store.columns[sensor_id]])
+    envelope = transformer.envelope(chunk)
 
-                cumulative_synthetic[:, offset_y:offset_z] = current_synthetic[:]
+    chunk_timedelta = get_chunk_timedelta(
+        diagnostic_task, chunk_index, number_of_timesteps, float(uploaded_file.meta['sample_rate'])
+    )
 
-                offset_x = offset_x + 1
+    return pd.DataFrame({method.value: series[0] for method, series in envelope.items()}), chunk_timedelta
 
-            return DetectiveDiagnosticResult(
-                chunk_index,
-                chunk_timedelta,
-                cumulative_synthetic,
-                cumulative_original
-            )
+
+def get_plot_parameters(diagnostic_task):
+    """
+    :return tuple: (original sample rate of the flight, chunk duration in seconds, downsample factor)
+    """
+    detection_task = diagnostic_task._model.detection_task
+    detection_result = services.detection.create_watson_detection_result(detection_task.detection_result)
+    _, transformer_configuration = services.watson.get_transformer_configuration(detection_task.training_task)
+
+    return (
+        detection_result.original_sample_rate,
+        detection_result.get_chunk_duration() / 1000,
+        transformer_configuration.get('downsample_factor', 4)
+    )
+
+
+def build_time_plot_data(data, chunk_timedelta, original_sample_rate, downsample_factor):
+    """
+    Indexes the downsampled data of a chunk with the time from the start of the flight.
+
+    :param pd.DataFrame data: the chunk, one row per downsampled timestep
+    :param chunk_timedelta: the time of the start of the chunk
+    """
+    data_frame = DataView(data, original_sample_rate // downsample_factor).to_dataframe()
+    data_frame.index = format_timedelta_labels(data_frame.index + pd.Timedelta(chunk_timedelta))
+    data_frame.index.name = 'timedelta'
+    return data_frame
+
+
+def build_frequency_plot_data(data, chunk_duration_in_seconds, downsample_factor):
+    """
+    Keeps the positive frequencies of the spectrum of a chunk, indexed by frequency.
+
+    :param pd.DataFrame data: the spectrum of the chunk, one row per frequency
+    """
+    data_length = data.shape[0]
+    is_even = not (data_length % 2)
+    low = 1
+    if is_even:
+        center = (data_length // 2)
+
+        upper = center
+    else:
+        center = (data_length - 1) // 2
+        upper = center + 1
+    positive_spectrum = data[low:upper].copy()
+    frequencies = calculate_frequency_index(positive_spectrum.shape[0], chunk_duration_in_seconds, downsample_factor)
+    positive_spectrum['timedelta'] = frequencies
+    positive_spectrum = positive_spectrum.set_index('timedelta')
+
+    return positive_spectrum
+
+
+def create_plot_payload(diagnostic_task, diagnostic_results):
+    """
+    Builds the diagnostic result as served by the plot endpoint: the series of every chunk
+    are indexed by time or by frequency, depending on the domain of the diagnostic.
+
+    :param DiagnosticTask diagnostic_task:
+    :param list diagnostic_results: the json serialised DiagnosticResult of each chunk
+    :return list: the json serialised plot data of each chunk
+    """
+    original_sample_rate, chunk_duration_in_seconds, downsample_factor = get_plot_parameters(diagnostic_task)
+    is_frequency_domain = diagnostic_task.is_frequency_domain
+
+    payload = []
+    for single_chunk in diagnostic_results:
+        plot_chunk = dict(single_chunk)
+        for key in PLOT_DATA_KEYS:
+            whole_signal_df = pd.DataFrame(single_chunk[key]).T
+            if is_frequency_domain:
+                data_frame = build_frequency_plot_data(whole_signal_df, chunk_duration_in_seconds, downsample_factor)
+            else:
+                data_frame = build_time_plot_data(
+                    whole_signal_df, single_chunk['chunk_timedelta'], original_sample_rate, downsample_factor)
+
+            plot_chunk[key] = data_frame.rename(columns=lambda column: "Sensor {}".format(column)).to_dict()
+        payload.append(plot_chunk)
+
+    return json_reload(payload)
+
+
+def digest_plot_payload(plot_payload):
+    """
+    The ETag of the plot endpoint, stored with the payload so that conditional requests
+    are answered without serialising it.
+
+    :param list plot_payload: the json serialised plot data of each chunk
+    :return str:
+    """
+    return hashlib.sha1(json.dumps(plot_payload, sort_keys=True).encode()).hexdigest()
+
+
+def _get_stored_plot(diagnostic_task):
+    """
+    Returns the diagnostic result with its plot payload and digest. Results stored before them
+    existed get them built and saved on the first read.
+    """
+    diagnostic_result = diagnostic_task._model.diagnostic_result
+    if diagnostic_result.plot is None or diagnostic_result.plot_digest is None:
+        if diagnostic_result.plot is None:
+            logging.info(f"Building the plot payload of diagnostic {diagnostic_task.task_code}")
+            diagnostic_result.plot = create_plot_payload(diagnostic_task, diagnostic_result.result)
+        diagnostic_result.plot_digest = digest_plot_payload(diagnostic_result.plot)
+        diagnostic_result.update()
+
+    return diagnostic_result
+
+
+def get_plot_payload(diagnostic_task):
+    return _get_stored_plot(diagnostic_task).plot
+
+
+def get_plot_digest(diagnostic_task):
+    return _get_stored_plot(diagnostic_task).plot_digest
 
 
 def calculate_frequency_index(data_size, chunk_length_in_seconds, downsample_factor):
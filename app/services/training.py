@@ -1,13 +1,19 @@
 import logging
 import os
+import pickle
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import numpy as np
 from alphai_watson.datasource import Sample
 from alphai_watson.datasource.flight import FlightDataSource
 from alphai_watson.performance import GANPerformanceAnalysis
 
+from app import services
+from app.core.storage import open_flight_store, replace_atomically
 from app.core.utils import merge_dictionaries
 from app.entities import TrainingTaskStatusEntity, TrainingTaskEntity, TaskStatusTypes
-from config import TRAIN_ROOT_FOLDER
+from config import TRAIN_ROOT_FOLDER, STREAMING_TRAINING_DATASOURCE, TRAINING_LOADER_WORKERS
 
 DEFAULT_TRAIN_ITERS_ON_RETRAIN = 10000
 DEFAULT_LEARN_RATE = 0.0001
@@ -43,20 +49,25 @@ def filter_by_status(query, task_status_type ):
 
 
 class TrainFlightDatasource(FlightDataSource):
+    TRAIN_FRACTION = 0.8
 
-    def __init__(self, sample_list, transformer):
+    def __init__(self, sample_list, transformer, number_of_workers=TRAINING_LOADER_WORKERS):
         self._sample_list = sample_list
         self._transformer = transformer
+        self._number_of_workers = number_of_workers
         self._raw_data = self._read_samples()
+        self._data = None
+
+    def _read_sample(self, flight_dataframe):
+        flight_array = flight_dataframe.values
+        logging.debug("Start reshape for flight")
+        reshaped_flight_data = self._reshape_flight_data(flight_array)
+        logging.debug("End reshape for flight")
+        return reshaped_flight_data
 
     def _read_samples(self):
-        flights = []
-        for flight_dataframe in self._sample_list:
-            flight_array = flight_dataframe.values
-            logging.debug("Start reshape for flight")
-            reshaped_flight_data = self._reshape_flight_data(flight_array)
-            logging.debug("End reshape for flight")
-            flights.append(reshaped_flight_data)
+        with ThreadPoolExecutor(max_workers=self._number_of_workers) as executor:
+            flights = list(executor.map(self._read_sample, self._sample_list))
 
         return {'NORMAL': flights}
 
@@ -64,45 +75,205 @@ class TrainFlightDatasource(FlightDataSource):
     def transformer(self):
         return self._transformer
 
-    def get_train_data(self, *args, **kwargs):
-        raw_samples = self._raw_data['NORMAL']
-        data = self._extract_and_process_samples(raw_samples)
-        total_length = data.shape[0]
-        upper_limit = int(total_length * 0.8)
+    @property
+    def data(self):
+        """ The processed training set. It's computed only once, then the raw flights are released """
+        if self._data is None:
+            self._data = self._extract_and_process_samples(self._raw_data['NORMAL'])
+            self._sample_list = None
+            self._raw_data = None
+        return self._data
+
+    def _create_sample(self, data):
         return Sample(
-            data=data[0:upper_limit],
+            data=data,
             sample_type='NORMAL',
             sample_rate=self.sample_rate,
             number_of_timesteps=self._transformer.number_of_timesteps
         )
 
+    def get_train_data(self, *args, **kwargs):
+        upper_limit = int(self.data.shape[0] * self.TRAIN_FRACTION)
+        return self._create_sample(self.data[0:upper_limit])
+
     def get_test_data(self, *args, **kwargs):
-        raw_samples = self._raw_data['NORMAL']
-        data = self._extract_and_process_samples(raw_samples)
-        total_length = data.shape[0]
-        upper_limit = int(total_length * 0.8)
+        upper_limit = int(self.data.shape[0] * self.TRAIN_FRACTION)
+        return self._create_sample(self.data[upper_limit:])
 
-        return Sample(
-            data=data[upper_limit:],
-            sample_type='NORMAL',
-            sample_rate=self.sample_rate,
-            number_of_timesteps=self._transformer.number_of_timesteps
-        )
 
+class StreamingTrainFlightDatasource(TrainFlightDatasource):
+    """
+    Training datasource which never holds all the flights in memory.
+
+    The flights are read from their store and processed one at a time into a memory mapped
+    tensor at location, and the train and test data are slices of it.
+    Every flight goes through the transformer on its own, so the result is the same as the one of
+    TrainFlightDatasource only for transformers which don't fit anything on the whole training set.
+    """
 
-def create_training_datasource(training_task, transformer):
-    sample_list = []
-    for datasource in training_task.datasources:
-        sample_list.append(
-            datasource.get_file()
+    def __init__(self, datasource_list, transformer, location):
+        self._datasource_list = datasource_list
+        self._transformer = transformer
+        self._location = location
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self._build_tensor()
+        return self._data
+
+    def _process_flight(self, datasource):
+        store = datasource.get_store()
+        # the store is [n_sensors, n_timesteps], the transposed view matches the layout of the flight dataframe
+        return self._extract_and_process_samples([self._reshape_flight_data(store.data.T)])
+
+    def _build_tensor(self):
+        number_of_timesteps = self._transformer.number_of_timesteps
+        chunks_per_flight = [
+            datasource.get_store().number_of_timesteps // number_of_timesteps for datasource in self._datasource_list
+        ]
+
+        processed_flight = self._process_flight(self._datasource_list[0])
+
+        os.makedirs(os.path.dirname(self._location), exist_ok=True)
+
+        def write_tensor(temporary_location):
+            nonlocal processed_flight
+            tensor = np.lib.format.open_memmap(
+                temporary_location, mode='w+', dtype=processed_flight.dtype,
+                shape=(sum(chunks_per_flight),) + processed_flight.shape[1:]
+            )
+
+            start = 0
+            for position, (datasource, number_of_chunks) in enumerate(zip(self._datasource_list, chunks_per_flight)):
+                if position:
+                    processed_flight = self._process_flight(datasource)
+                if processed_flight.shape[0] != number_of_chunks:
+                    raise ValueError(
+                        f"The transformer returned {processed_flight.shape[0]} chunks for flight "
+                        f"{datasource.upload_code}, {number_of_chunks} expected: "
+                        f"it can't be used with the streaming training datasource"
+                    )
+                logging.debug(f"Processed flight {position + 1} of {len(chunks_per_flight)} for training")
+                tensor[start:start + number_of_chunks] = processed_flight
+                start += number_of_chunks
+                processed_flight = None
+
+            tensor.flush()
+            del tensor
+
+        # a unique temporary file, removed if the build fails, so that concurrent builds never share it
+        replace_atomically(self._location, write_tensor)
+
+        return np.load(self._location, mmap_mode='c')
+
+
+def load_flights(training_task, report_progress=False, number_of_workers=TRAINING_LOADER_WORKERS):
+    """
+    Loads the flights of a training concurrently.
+
+    :param TrainingTaskEntity training_task:
+    :param bool report_progress: whether to add the loading progress to the training statuses
+    :param int number_of_workers: the number of flights loaded at the same time
+
+    :return list: the flight dataframes, in the order of training_task.datasources
+    """
+    # the entities are only accessed here, and the missing stores are built one at a time before the threads
+    # start, as the HDF5 library is not thread safe: the threads only copy the memory mapped stores
+    stores = [open_flight_store(datasource.location) for datasource in training_task.datasources]
+    number_of_flights = len(stores)
+    report_every = max(1, number_of_flights // 10)
+    flights = [None] * number_of_flights
+
+    with ThreadPoolExecutor(max_workers=number_of_workers) as executor:
+        futures = {
+            executor.submit(store.read): position
+            for position, store in enumerate(stores)
+        }
+        for number_of_loaded_flights, future in enumerate(as_completed(futures), start=1):
+            flights[futures[future]] = future.result()
+            if report_progress and (number_of_loaded_flights % report_every == 0 or
+                                    number_of_loaded_flights == number_of_flights):
+                set_task_status(
+                    training_task, TaskStatusTypes.in_progress,
+                    message=f'Loaded {number_of_loaded_flights} of {number_of_flights} flights'
+                )
+
+    return flights
+
+
+def create_training_datasource(training_task, transformer, report_progress=False):
+    if STREAMING_TRAINING_DATASOURCE:
+        return StreamingTrainFlightDatasource(
+            training_task.datasources,
+            transformer,
+            training_task.training_data_location
         )
 
     return TrainFlightDatasource(
-        sample_list,
+        load_flights(training_task, report_progress),
         transformer
     )
 
 
+def delete_training_data(training_task):
+    """
+    Removes the training data written by the streaming training datasource, if any.
+    """
+    if os.path.exists(training_task.training_data_location):
+        os.remove(training_task.training_data_location)
+
+
+def save_transformer(training_task, transformer):
+    """
+    Stores the fitted transformer of a training, so that detection and diagnostic
+    don't need to look at the training data again to initialize it.
+    """
+    os.makedirs(training_task.train_data_dir, exist_ok=True)
+
+    def write_transformer(temporary_location):
+        with open(temporary_location, 'wb') as transformer_file:
+            pickle.dump(transformer, transformer_file)
+
+    replace_atomically(training_task.transformer_location, write_transformer)
+
+
+def load_transformer(training_task):
+    try:
+        with open(training_task.transformer_location, 'rb') as transformer_file:
+            return pickle.load(transformer_file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Unable to load the stored transformer for {training_task.task_code}: {e}")
+        return None
+
+
+def get_initialized_transformer(training_task):
+    """
+    Returns the transformer fitted on the training data.
+
+    Trainings created before the transformer was persisted have it re-fitted by
+    looking at the training data once; the result is then stored for the next run.
+    """
+    transformer = load_transformer(training_task)
+    if transformer is not None:
+        return transformer
+
+    logging.info(f"No stored transformer for training {training_task.task_code}: fitting it on the training data")
+    transformer = services.watson.create_transformer_from_configuration(training_task)
+    training_datasource = create_training_datasource(training_task, transformer)
+    try:
+        # with this function we trigger the normalizer's viewing of the train data
+        training_datasource.get_train_data('NORMAL')
+    finally:
+        delete_training_data(training_task)
+    save_transformer(training_task, training_datasource.transformer)
+
+    return training_datasource.transformer
+
+
 def create_training_configuration(training_task_code,
                                   company_id,
                                   company_configuration,
@@ -152,6 +323,33 @@ def create_training_configuration(training_task_code,
     return training_configuration
 
 
+def get_consumed_datasource_ids(training_task):
+    """ The ids of the datasources used by a training and by all its ancestors """
+    consumed_ids = set()
+    while training_task:
+        consumed_ids.update(datasource.id for datasource in training_task.datasources)
+        training_task = training_task.parent_task
+    return consumed_ids
+
+
+def select_incremental_datasources(parent_task, datasources, replay_fraction=0.):
+    """
+    Selects the datasources for an incremental retrain of parent_task: the ones which haven't been used
+    by the parent or its ancestors, plus a random replay_fraction of the ones which have.
+
+    :return tuple: (list of new datasources, list of replayed datasources)
+    """
+    consumed_ids = get_consumed_datasource_ids(parent_task)
+
+    new_datasources = [datasource for datasource in datasources if datasource.id not in consumed_ids]
+    consumed_datasources = [datasource for datasource in datasources if datasource.id in consumed_ids]
+
+    number_of_replayed_datasources = int(round(len(consumed_datasources) * replay_fraction))
+    replayed_datasources = random.sample(consumed_datasources, number_of_replayed_datasources)
+
+    return new_datasources, replayed_datasources
+
+
 def update_root_folder_in_model_config(training_task_entity):
 
     load_relative_path = training_task_entity.configuration['model']['configuration']['model_configuration'][
@@ -9,6 +9,10 @@ class ResampleMethod(enum.Enum):
     MEAN = 'mean'
     MAX = 'max'
     MIN = 'min'
+    RMS = 'rms'
+
+
+ENVELOPE_METHODS = (ResampleMethod.MEAN, ResampleMethod.MAX, ResampleMethod.MIN)
 
 
 class SimpleTransformer(AbstractDataTransformer):
@@ -38,11 +42,14 @@ class SimpleTransformer(AbstractDataTransformer):
 
         return sample.astype(D_TYPE)
 
-    def process_stacked_samples(self, full_data):
+    def process_stacked_samples(self, full_data, resample_methods=None):
         """  Prepare list of large data samples for entry into network.
         :param full_data: array of [n_sensors, n_timesteps]
+        :param resample_methods: list of ResampleMethod to downsample with at once, see _process_multiple_methods
         :return: 4D nparray of shape [n_chunks, feature_length, n_sensors]
         """
+        if resample_methods is not None:
+            return self._process_multiple_methods(full_data, resample_methods)
 
         full_data = full_data.astype(np.float32, copy=False)
 
@@ -64,9 +71,55 @@ class SimpleTransformer(AbstractDataTransformer):
                 full_data = np.max(temp, axis=-1)
             elif self._resample_method == ResampleMethod.MIN:
                 full_data = np.min(temp, axis=-1)
+            elif self._resample_method == ResampleMethod.RMS:
+                full_data = np.sqrt(np.mean(np.square(temp), axis=-1, dtype=D_TYPE))
 
         return full_data  # [n_chunks, feature_length, n_sensors]
 
+    def _process_multiple_methods(self, full_data, resample_methods):
+        """ Downsamples with every method out of a single reshape of the flight.
+
+        The reshape only splits the timesteps axis, so it's a view of full_data whatever its layout,
+        and every reduction writes straight into its slot of the output: the only allocation is the output.
+
+        :param full_data: array of [n_sensors, n_timesteps]
+        :param resample_methods: list of ResampleMethod
+        :return: nparray of shape [n_methods, n_chunks, n_sensors, n_timesteps // downsample_factor]
+        """
+        downsample_factor = max(self.downsample_factor, 1)
+        n_sensors = full_data.shape[0]
+        n_bins = self._sample_length // downsample_factor
+
+        temp = full_data.reshape((n_sensors, -1, n_bins, downsample_factor))  # [n_sensors, n_chunks, n_bins, factor]
+        stacked = np.empty((len(resample_methods), temp.shape[1], n_sensors, n_bins), dtype=D_TYPE)
+
+        for position, resample_method in enumerate(resample_methods):
+            out = stacked[position].swapaxes(0, 1)  # [n_sensors, n_chunks, n_bins] view of the output
+
+            if resample_method == ResampleMethod.MEAN:
+                np.add.reduce(temp, axis=-1, out=out)
+                out /= downsample_factor
+            elif resample_method == ResampleMethod.MAX:
+                np.maximum.reduce(temp, axis=-1, out=out)
+            elif resample_method == ResampleMethod.MIN:
+                np.minimum.reduce(temp, axis=-1, out=out)
+            elif resample_method == ResampleMethod.RMS:
+                np.einsum('...i,...i->...', temp, temp, out=out, casting='same_kind')
+                out /= downsample_factor
+                np.sqrt(out, out=out)
+            else:
+                raise ValueError(f"Unknown resample method {resample_method}")
+
+        return stacked
+
+    def envelope(self, chunk):
+        """ Downsamples a chunk with every method of ENVELOPE_METHODS in a single pass.
+        :param chunk: array of [n_sensors, feature_length]
+        :return: dict of ResampleMethod: array of shape [n_sensors, feature_length // downsample_factor]
+        """
+        stacked = self.process_stacked_samples(chunk, ENVELOPE_METHODS)
+        return {method: stacked[position, 0] for position, method in enumerate(ENVELOPE_METHODS)}
+
     @staticmethod
     def create_from_original_transformer(original_transformer, resample_method):
 
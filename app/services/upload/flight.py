@@ -6,7 +6,11 @@ warnings.simplefilter(action='ignore', category=PerformanceWarning)
 
 import os
 
-from app.services.upload.base import AbstractUploadManager
+import numpy as np
+import pandas as pd
+
+from app.core.storage import FlightStore, FlightPyramid, iterate_hdf_blocks
+from app.services.upload.base import AbstractUploadManager, UploadException
 from config import UPLOAD_ROOT_FOLDER, HDF5_STORE_INDEX
 
 
@@ -42,13 +46,65 @@ class FlightUploadManager(AbstractUploadManager):
     def validate(self, uploaded_file, datasource_type_id):
         return super().validate(uploaded_file, datasource_type_id=datasource_type_id)
 
+    def _validate_data_interpreter(self, uploaded_file, **kwargs):
+        uploaded_flight, errors = self._datasource_interpreter.from_upload_to_file(uploaded_file, **kwargs)
+
+        if errors:
+            raise UploadException(f"Invalid file uploaded: {'|'.join(errors)}")
+
+        return uploaded_flight
+
     def process(self, uploaded_dataframe, existing_dataframe=None):
         return uploaded_dataframe
 
-    def store(self, final_dataframe, company_id, upload_code):
+    def store(self, uploaded_flight, company_id, upload_code):
+        """
+        Moves the validated upload to its final location.
+
+        If the upload is already a float32 flight stored under the expected key it is simply renamed,
+        otherwise it's converted in blocks of rows, so the memory used doesn't depend on the flight size.
+        """
         upload_path = os.path.join(UPLOAD_ROOT_FOLDER, str(company_id))
         os.makedirs(upload_path, exist_ok=True)
         saved_path = os.path.join(upload_path, f'{upload_code}.hdf5')
-        final_dataframe.to_hdf(saved_path, key=HDF5_STORE_INDEX)
+
+        try:
+            if self._is_in_final_format(uploaded_flight):
+                os.replace(uploaded_flight.location, saved_path)
+            else:
+                self._convert(uploaded_flight, saved_path)
+                os.remove(uploaded_flight.location)
+
+            FlightStore.from_hdf(saved_path)
+        except Exception:
+            super().cleanup(uploaded_flight.location)
+            self.cleanup(saved_path)
+            raise
 
         return saved_path
+
+    @staticmethod
+    def _is_in_final_format(uploaded_flight):
+        if uploaded_flight.key.strip('/') != HDF5_STORE_INDEX:
+            return False
+
+        with pd.HDFStore(uploaded_flight.location, 'r') as store:
+            if store.get_storer(uploaded_flight.key).is_table:
+                return False
+            first_row = store.select(uploaded_flight.key, start=0, stop=1)
+
+        return all(dtype == np.float32 for dtype in first_row.dtypes)
+
+    @staticmethod
+    def _convert(uploaded_flight, saved_path):
+        with pd.HDFStore(uploaded_flight.location, 'r') as source, pd.HDFStore(saved_path, 'w') as target:
+            for _, block in iterate_hdf_blocks(source, uploaded_flight.key):
+                target.append(
+                    HDF5_STORE_INDEX, block.astype(np.float32, copy=False),
+                    index=False, expectedrows=uploaded_flight.number_of_rows
+                )
+
+    def cleanup(self, location):
+        super().cleanup(location)
+        FlightStore(location).delete()
+        FlightPyramid(location).delete()
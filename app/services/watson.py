@@ -1,4 +1,4 @@
-from app.core.utils import import_class
+from app.core.utils import import_class, request_memoize, model_id
 
 
 def get_datasource_class_from_company_configuration(company_configuration):
@@ -12,9 +12,24 @@ def get_datasource_class_from_company_configuration(company_configuration):
     return datasource_class
 
 
+def _configuration_key(entity_with_configuration):
+    entity_id = model_id(entity_with_configuration)
+    if entity_id is None:
+        return None
+    return type(getattr(entity_with_configuration, '_model', entity_with_configuration)).__name__, entity_id
+
+
+@request_memoize('transformer_configuration', key=_configuration_key)
+def get_transformer_configuration(entity_with_configuration):
+    """
+    :return tuple: (transformer class name, transformer configuration)
+    """
+    transformer = entity_with_configuration.configuration['transformer']
+    return transformer['class_name'], transformer['configuration']
+
+
 def create_transformer_from_configuration(entity_with_configuration):
-    transformer_class = entity_with_configuration.configuration['transformer']['class_name']
-    transformer_configuration = entity_with_configuration.configuration['transformer']['configuration']
+    transformer_class, transformer_configuration = get_transformer_configuration(entity_with_configuration)
 
     try:
         transformer = import_class(transformer_class)
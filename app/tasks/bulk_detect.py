@@ -0,0 +1,74 @@
+import logging
+
+import app.services.training
+from app import services
+from app.entities import TaskStatusTypes
+from app.tasks.base import BaseDBTask
+from app.tasks.detect import detect_and_diagnose
+
+
+class BulkDetectTask(BaseDBTask):
+    name = 'bulk_detection_task'
+
+    def run(self, training_task_code, task_codes):
+        """
+        Runs the detection tasks of many flights with the same training,
+        restoring the transformer and the detective only once.
+        """
+        training_task = app.services.training.get_training_for_task_code(training_task_code)
+        if not training_task:
+            logging.warning("No training task could be found for code %s", training_task_code)
+            return
+
+        company = services.company.get_by_id(training_task.company_id)
+
+        training_task = app.services.training.update_root_folder_in_model_config(training_task)
+        transformer = app.services.training.get_initialized_transformer(training_task)
+
+        datasource_class = services.watson.get_datasource_class_from_company_configuration(
+            company.current_configuration)
+
+        training_task = services.detective.set_correct_load_path_for_detection_and_diagnose(training_task)
+        detective = services.detective.get_detective(training_task)
+
+        number_of_tasks = len(task_codes)
+        for position, task_code in enumerate(task_codes, start=1):
+            detection_task = services.detection.get_task_by_code(task_code)
+            if not detection_task:
+                logging.warning("No detection task could be found for code %s", task_code)
+                continue
+
+            uploaded_file = services.datasource.get_by_upload_code(detection_task.upload_code)
+            if not uploaded_file:
+                services.detection.set_task_status(
+                    detection_task, TaskStatusTypes.failed,
+                    message=f'No upload could be found for code {detection_task.upload_code}'
+                )
+                continue
+
+            services.detection.set_task_status(
+                detection_task, TaskStatusTypes.in_progress,
+                message=f'Detection in progress ({position} of {number_of_tasks} in bulk)'
+            )
+
+            try:
+                detect_and_diagnose(detection_task, uploaded_file, datasource_class, transformer, detective)
+            except Exception as e:
+                logging.exception(f"Detection {task_code} failed")
+                services.detection.set_task_status(detection_task, TaskStatusTypes.failed, message=str(e))
+
+        logging.info(f"Bulk detection with training {training_task_code} is done")
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        training_task_code, task_codes = args[0], args[1]
+        logging.debug(f'Bulk detection for {training_task_code} raised exception: '
+                      f'{einfo.exception!r}\n{einfo.traceback!r}')
+        for task_code in task_codes:
+            detection_task = services.detection.get_task_by_code(task_code)
+            if detection_task and not detection_task._model.is_completed:
+                services.detection.set_task_status(
+                    detection_task, TaskStatusTypes.failed, message=str(einfo.exception)
+                )
+
+
+bulk_detect_celery_task = BulkDetectTask()
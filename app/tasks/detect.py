@@ -3,9 +3,9 @@ import logging
 import app.services.training
 from app import services
 from app.core.models import DetectionResult
-from app.core.utils import json_reload
 from app.entities import TaskStatusTypes
 from app.tasks.base import BaseDBTask
+from config import FUSED_DETECTION_DIAGNOSTIC
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -34,56 +34,25 @@ class DetectTask(BaseDBTask):
             message='Detection in progress'
         )
 
-        # In order to make the detection work, the normalizer of the datasource
-        # has to be initialized by looking at the training data at least once.
-        # in order to do that, I have to load the training datasource, and execute the get_train_data
-
-        # get the training task
+        # the transformer fitted at training time is restored from the training folder,
+        # the training data is only read for trainings which don't have it stored yet
         training_task = app.services.training.get_training_for_id(detection_task.training_task_id)
         training_task = app.services.training.update_root_folder_in_model_config(training_task)
 
-        transformer = self._create_and_initialize_transformer(training_task)
+        transformer = app.services.training.get_initialized_transformer(training_task)
 
         # we get the detection datasource
         datasource_class = services.watson.get_datasource_class_from_company_configuration(
             company.current_configuration)
 
-        # we initialized it with the training datasource transfomer
-        datasource = datasource_class(uploaded_file.location, transformer)
-
         training_task = services.detective.set_correct_load_path_for_detection_and_diagnose(training_task)
 
         logging.debug(training_task.configuration)
-        detective = services.detective.create_detective_from_configuration(training_task)
-
-        samples = list(datasource.get_test_data('NORMAL'))
-        logging.debug(f"Preparing detection on test data: {samples[0].data}")
-        detection = detective.detect(samples[0])
-
-        detection_result = DetectionResult(
-            company_id=company_id,
-            upload_code=detection_task.upload_code,
-            task_code=task_code,
-            result=json_reload(detection),
-            detection_task_id=detection_task.id
-        )
-
-        services.detection.insert_result(detection_result)
-
-        services.detection.set_task_status(detection_task, TaskStatusTypes.successful,
-                                           message=f'Task {task_code} has finished')
+        detective = services.detective.get_detective(training_task)
 
-        services.diagnostic.trigger_diagnostic(detection_task, upload_code)
+        detect_and_diagnose(detection_task, uploaded_file, datasource_class, transformer, detective)
         return
 
-    def _create_and_initialize_transformer(self, training_task):
-        transformer = services.watson.create_transformer_from_configuration(training_task)
-        training_datasource = app.services.training.create_training_datasource(training_task, transformer)
-        # with this function we trigger the normalizer's viewing of the train data
-        training_datasource.get_train_data('NORMAL')
-        return training_datasource.transformer
-
-
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         task_code = args[0]
         detection_task = services.detection.get_task_by_code(task_code)
@@ -91,4 +60,67 @@ class DetectTask(BaseDBTask):
         services.detection.set_task_status(detection_task, TaskStatusTypes.failed, message=str(einfo.exception))
 
 
+def detect_and_diagnose(detection_task, uploaded_file, datasource_class, transformer, detective):
+    """
+    Runs the detection of a flight and stores its result, then runs or enqueues its diagnostic.
+
+    :param DetectionTask detection_task:
+    :param DataSource uploaded_file: the flight to run the detection on
+    :param datasource_class: the watson datasource class of the company
+    :param transformer: the transformer fitted on the training data
+    :param detective: the detective restored from the training checkpoint
+    """
+    task_code = detection_task.task_code
+
+    # we initialized it with the training datasource transfomer
+    datasource = datasource_class(uploaded_file.location, transformer)
+
+    samples = list(datasource.get_test_data('NORMAL'))
+    logging.debug(f"Preparing detection on test data: {samples[0].data}")
+    detection = detective.detect(samples[0])
+    result, scores = services.detection.serialize_watson_detection_result(detection)
+
+    detection_result = DetectionResult(
+        company_id=uploaded_file.company_id,
+        upload_code=detection_task.upload_code,
+        task_code=task_code,
+        result=result,
+        scores=scores,
+        detection_task_id=detection_task.id
+    )
+
+    services.detection.insert_result(detection_result)
+    services.detection.cache_probabilities(detection_task, detection)
+
+    services.detection.set_task_status(detection_task, TaskStatusTypes.successful,
+                                       message=f'Task {task_code} has finished')
+
+    if FUSED_DETECTION_DIAGNOSTIC:
+        diagnose_in_process(detection_task, uploaded_file, samples[0], detective)
+    else:
+        services.diagnostic.trigger_diagnostic(detection_task, uploaded_file.upload_code)
+
+
+def diagnose_in_process(detection_task, uploaded_file, sample, detective):
+    """
+    Runs the diagnostic in process, reusing the flight and the detective loaded for the detection.
+    A failure is recorded on the diagnostic task only, the detection is already stored.
+    """
+    services.diagnostic.create_diagnostic_task(
+        detection_task, uploaded_file.upload_code,
+        message=f'Diagnostic for {detection_task.task_code} will run after the detection'
+    )
+    diagnostic_task = services.diagnostic.get_task_by_code(detection_task.task_code)
+
+    try:
+        services.diagnostic.run_diagnostic(diagnostic_task, uploaded_file, sample, detective)
+    except Exception as e:
+        logging.exception(f"Diagnostic for {detection_task.task_code} failed")
+        services.diagnostic.set_task_status(
+            task_id=diagnostic_task.id,
+            status=TaskStatusTypes.failed,
+            message=str(e)
+        )
+
+
 detect_celery_task = DetectTask()
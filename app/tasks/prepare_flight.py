@@ -0,0 +1,24 @@
+import logging
+
+from app import services
+from app.tasks.base import BaseDBTask
+
+
+class PrepareFlightTask(BaseDBTask):
+    name = 'prepare_flight_task'
+
+    def run(self, upload_code):
+        """
+        Builds the store and the downsample pyramid of a flight uploaded before they existed,
+        so that the web requests only ever read them.
+        """
+        datasource = services.datasource.get_by_upload_code(upload_code)
+        if not datasource:
+            logging.warning("No upload could be found for code %s", upload_code)
+            return
+
+        services.datasource.prepare_flight(datasource)
+        logging.info(f"Flight {upload_code} is prepared")
+
+
+prepare_flight_celery_task = PrepareFlightTask()
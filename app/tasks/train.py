@@ -36,50 +36,59 @@ class TrainTask(BaseDBTask):
 
         logging.info("Created detective")
         transformer = services.watson.create_transformer_from_configuration(mocked_training_task)
-        datasource = app.services.training.create_training_datasource(training_task_entity, transformer)
+        datasource = app.services.training.create_training_datasource(
+            training_task_entity, transformer, report_progress=True
+        )
 
-        logging.info("Loaded datasource for training")
+        try:
+            logging.info("Loaded datasource for training")
 
-        logging.info("Start Training")
-        is_a_retrain = training_task_entity.parent_training_id
+            logging.info("Start Training")
+            is_a_retrain = training_task_entity.parent_training_id
 
-        if not is_a_retrain:
-            # this is not a retrain, so don't try to restore the model
-            detective.model.load_path = None
+            if not is_a_retrain:
+                # this is not a retrain, so don't try to restore the model
+                detective.model.load_path = None
 
-        detective.train(datasource.get_train_data())
+            detective.train(datasource.get_train_data())
 
-        if is_a_retrain:
-            # if this is a retrain, load_path and save_path will be different
-            # set the load to be the same as the previous save
-            # to avoid loading an old checkpoint during calibration
-            save_path = training_task_entity.configuration['model']['configuration']['model_configuration']['save_path']
-            training_task_entity.configuration['model']['configuration']['model_configuration']['load_path'] = save_path
-            detective.model.load_path = os.path.join(TRAIN_ROOT_FOLDER, save_path)
+            if is_a_retrain:
+                # if this is a retrain, load_path and save_path will be different
+                # set the load to be the same as the previous save
+                # to avoid loading an old checkpoint during calibration
+                save_path = training_task_entity.configuration['model']['configuration']['model_configuration']['save_path']
+                training_task_entity.configuration['model']['configuration']['model_configuration']['load_path'] = save_path
+                detective.model.load_path = os.path.join(TRAIN_ROOT_FOLDER, save_path)
 
-        performance = app.services.training.get_performance_analysis(mocked_training_task)
+            performance = app.services.training.get_performance_analysis(mocked_training_task)
 
-        k, x0, anomaly_prior = services.calibration.estimate_calibration_parameters(
-            detective,
-            datasource.get_test_data(),
-            performance,
-            datasource.get_train_data()
-        )
+            k, x0, anomaly_prior = services.calibration.estimate_calibration_parameters(
+                detective,
+                datasource.get_test_data(),
+                performance,
+                datasource.get_train_data()
+            )
+
+            logging.info(
+                f"Calibration parameter for {training_task_code}: k: {k}, x0: {x0}, anomaly_prior: {anomaly_prior}")
 
-        logging.info(
-            f"Calibration parameter for {training_task_code}: k: {k}, x0: {x0}, anomaly_prior: {anomaly_prior}")
+            calibration_parameters = {
+                'k': k,
+                'x0': x0,
+                'anomaly_prior': anomaly_prior
+            }
 
-        calibration_parameters = {
-            'k': k,
-            'x0': x0,
-            'anomaly_prior': anomaly_prior
-        }
+            training_task_entity.configuration['calibration'] = calibration_parameters
+            flag_modified(training_task_entity, "configuration")
+            training_task_entity.update()
 
-        training_task_entity.configuration['calibration'] = calibration_parameters
-        flag_modified(training_task_entity, "configuration")
-        training_task_entity.update()
+            # the transformer has been fitted on the train data: store it for detection and diagnostic
+            app.services.training.save_transformer(training_task_entity, datasource.transformer)
 
-        services.training.set_task_status(training_task_entity, status=TaskStatusTypes.successful, message='Successful')
+            services.training.set_task_status(training_task_entity, status=TaskStatusTypes.successful, message='Successful')
+        finally:
+            # the streaming datasource writes the processed flights next to the model
+            app.services.training.delete_training_data(training_task_entity)
 
 
     def on_failure(self, exc, task_id, args, kwargs, einfo):
@@ -1,16 +1,16 @@
 import logging
 
-from flask import Blueprint, request, url_for, g, flash, jsonify, Response
+from flask import Blueprint, request, url_for, g, flash, jsonify, Response, abort
 from sqlalchemy_pagination import paginate
 
 from app import services
 from app.core.auth import requires_access_token
-from app.core.content import ApiResponse
+from app.core.content import ApiResponse, DataFrameResponse
+from app.core.storage import PYRAMID_STATISTICS, FlightNotPreparedError
 from app.core.utils import generate_upload_code, handle_error, parse_request_data
 from app.entities import TaskStatusTypes, TrainingTaskEntity
 from app.entities.datasource import DataSourceConfigurationEntity, LabelTypes, DataSourceEntity
-from app.interpreters.dataview import DataView
-from config import DEFAULT_VIEW_TIME_RESAMPLE_RULE
+from app.interpreters.dataview import DataView, data_frame_to_dict
 
 datasource_blueprint = Blueprint('datasource', __name__)
 
@@ -177,24 +177,65 @@ def save_label():
 @datasource_blueprint.route('/<string:upload_code>/data', methods=['GET'])
 def data(upload_code):
     datasource = services.datasource.get_by_upload_code(upload_code=upload_code)
-    data_view = DataView.create_from_datasource(datasource)
-    data_view.wrap_columns_name('Sensor {}')
+    data_view = _create_data_view(datasource)
     normalize = True if request.args.get('normalize') else False
+    data_frame = data_view.to_dataframe(normalize=normalize)
 
-    return jsonify(data_view.to_dict(DEFAULT_VIEW_TIME_RESAMPLE_RULE, normalize))
+    response = DataFrameResponse(
+        content_type=request.accept_mimetypes.best,
+        data_frame=data_frame,
+        default_response=lambda: jsonify(data_frame_to_dict(data_frame))
+    )
+    return response()
 
 
 @datasource_blueprint.route('/<string:upload_code>/csv', methods=['GET'])
 def data_csv(upload_code):
     datasource = services.datasource.get_by_upload_code(upload_code=upload_code)
-    data_view = DataView.create_from_datasource(datasource)
-    data_view.wrap_columns_name('Sensor {}')
+    data_view = _create_data_view(datasource)
     normalize = True if request.args.get('normalize') else False
+    data_frame = data_view.to_dataframe(normalize=normalize)
 
-    return Response(
-        data_view.to_csv(DEFAULT_VIEW_TIME_RESAMPLE_RULE, normalize),
-        mimetype='text/plain'
+    response = DataFrameResponse(
+        content_type=request.accept_mimetypes.best,
+        data_frame=data_frame,
+        default_response=lambda: Response(data_frame.to_csv(), mimetype='text/plain')
     )
+    return response()
+
+
+def _create_data_view(datasource):
+    """
+    Builds the view of the flight for the query parameters of the request:
+
+     - `start`, `end`: the time window in seconds from the start of the flight
+     - `sensors`: comma separated indexes of the sensors to return
+     - `max_points`: the maximum number of points per sensor
+     - `statistic`: `mean`, `min` or `max`, used when the window is downsampled
+    """
+    statistic = request.args.get('statistic', 'mean')
+    if statistic not in PYRAMID_STATISTICS:
+        abort(400, f"Invalid statistic {statistic}, choose one of {', '.join(PYRAMID_STATISTICS)}")
+
+    sensors = request.args.get('sensors')
+    try:
+        sensors = [int(sensor) for sensor in sensors.split(',')] if sensors else None
+        data_view = DataView.create_from_flight(
+            datasource,
+            start=request.args.get('start', type=float),
+            end=request.args.get('end', type=float),
+            sensors=sensors,
+            max_points=request.args.get('max_points', type=int),
+            statistic=statistic
+        )
+    except ValueError as e:
+        abort(400, str(e))
+    except FlightNotPreparedError:
+        services.datasource.trigger_flight_preparation(datasource)
+        abort(503, "The flight is being prepared, please retry in a few minutes")
+
+    data_view.wrap_columns_name('Sensor {}')
+    return data_view
 
 
 @datasource_blueprint.route('/', methods=['POST'])
@@ -232,7 +273,7 @@ def upload():
     upload_manager = services.company.get_upload_manager(company_configuration)
 
     try:
-        uploaded_dataframe = upload_manager.validate(uploaded_file, datasource_type_id)
+        uploaded_data = upload_manager.validate(uploaded_file, datasource_type_id)
     except Exception as e:
         message = f"Data validation has failed: {str(e)}"
         return handle_error(400, message)
@@ -241,7 +282,7 @@ def upload():
 
     try:
         datasource = services.datasource.save_datasource(
-            datasource_name, company.id, datasource_type_id, upload_code, upload_manager, uploaded_dataframe, user
+            datasource_name, company.id, datasource_type_id, upload_code, upload_manager, uploaded_data, user
         )
     except Exception as e:
         upload_manager.cleanup(upload_code)
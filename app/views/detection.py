@@ -7,10 +7,12 @@ from sqlalchemy_pagination import paginate
 import app.services.training
 from app import services
 from app.core.auth import requires_access_token
-from app.core.content import ApiResponse
+from app.core.content import ApiResponse, DataFrameResponse
 from app.core.utils import parse_request_data, handle_error
-from app.entities import DetectionTaskEntity
+from app.entities import DetectionTaskEntity, DataSourceEntity
+from app.entities.datasource import LabelTypes
 from app.interpreters.dataview import DataView
+from app.tasks.bulk_detect import bulk_detect_celery_task
 from app.tasks.detect import detect_celery_task
 from config import DEFAULT_VIEW_TIME_RESAMPLE_RULE
 
@@ -51,6 +53,84 @@ def submit(upload_code):
     return response()
 
 
+@detection_blueprint.route('/bulk', methods=['POST'])
+@requires_access_token
+@parse_request_data
+def submit_bulk():
+    """
+    Runs the detection of a training on many flights in a single worker job.
+
+    The flights are the ones in upload_codes or, if it's not given, all the flights of the
+    datasource configuration of the training (optionally only the ones with the given label).
+    """
+    user_id = g.user.id
+    company_id = g.user.company_id
+    training_task_code = g.json.get('training_task_code')
+    detection_name = g.json.get('name') or 'Bulk detection'
+
+    training_task = app.services.training.get_training_for_task_code(training_task_code)
+    if not training_task:
+        return handle_error(404, 'No training found!')
+    if not training_task.company_id == company_id:
+        return handle_error(403, 'Unauthorised')
+
+    upload_codes = g.json.get('upload_codes')
+    if upload_codes:
+        if isinstance(upload_codes, str):
+            upload_codes = [upload_code.strip() for upload_code in upload_codes.split(',') if upload_code.strip()]
+        datasources = [services.datasource.get_by_upload_code(upload_code) for upload_code in upload_codes]
+        if not all(datasources):
+            return handle_error(404, 'No datasource found!')
+    else:
+        query = services.datasource.filter_by_company_id(DataSourceEntity.query, company_id)
+        query = services.datasource.filter_by_datasource_configuration_id(
+            query, training_task.datasource_configuration_id)
+        label = g.json.get('label')
+        if label:
+            try:
+                query = services.datasource.filter_by_label(query, LabelTypes[label])
+            except KeyError:
+                return handle_error(400, f'Invalid label {label}')
+        datasources = query.all()
+
+    if not datasources:
+        return handle_error(400, 'No datasources to run the detection on')
+    if not all(datasource.company_id == company_id for datasource in datasources):
+        return handle_error(403, 'Unauthorised')
+    if not all(datasource.datasource_configuration_id == training_task.datasource_configuration_id
+               for datasource in datasources):
+        return handle_error(400, 'The flights must have the datasource configuration of the training')
+
+    detection_tasks = [
+        services.detection.trigger_detection(
+            f"{detection_name} - {datasource.name}", datasource, training_task, user_id
+        )
+        for datasource in datasources
+    ]
+
+    bulk_detect_celery_task.apply_async(
+        (training_task_code, [detection_task.task_code for detection_task in detection_tasks])
+    )
+
+    response = ApiResponse(
+        content_type=request.accept_mimetypes.best,
+        next=url_for('detection.list'),
+        context={
+            'detection_tasks': [
+                {
+                    'task_code': detection_task.task_code,
+                    'upload_code': detection_task.upload_code,
+                    'task_status': url_for('detection.detail', task_code=detection_task.task_code, _external=True),
+                    'result': url_for('detection.result', task_code=detection_task.task_code, _external=True)
+                }
+                for detection_task in detection_tasks
+            ]
+        }
+    )
+
+    return response()
+
+
 @detection_blueprint.route('/', methods=['GET'])
 @requires_access_token
 def list():
@@ -114,7 +194,11 @@ def delete(task_code):
 @detection_blueprint.route('/result', methods=['GET'])
 @requires_access_token
 def get_results():
-    return jsonify(g.user.company.detection_results)
+    detection_results = services.detection.get_results_for_company(g.user.company_id)
+    for detection_result in detection_results:
+        detection_result.result = services.detection.add_scores_to_result(detection_result)
+
+    return jsonify(detection_results)
 
 
 @detection_blueprint.route('/<string:task_code>/result', methods=['GET'])
@@ -125,6 +209,8 @@ def result(task_code):
         logging.debug(f"No result was found for task code {task_code}")
         abort(404, 'No result found!')
 
+    detection_result.result = services.detection.add_scores_to_result(detection_result)
+
     response = ApiResponse(
         content_type=request.accept_mimetypes.best,
         context=detection_result
@@ -143,19 +229,20 @@ def result_data(task_code):
         data_view = DataView(pd.DataFrame(), sample_rate=1)
     else:
         detection_task = services.detection.get_task_by_code(task_code)
-        k, x0, anomaly_prior = services.detection.load_calibration_values(detection_task)
-
-        detection_result = services.detection.create_watson_detection_result_from_dictionary(detection_result.result)
+        probabilities, sample_rate = services.detection.get_calibrated_probabilities(detection_task)
 
-        data_view = DataView.create_from_detection_result(detection_result, k, x0, anomaly_prior)
+        data_view = DataView(pd.DataFrame(probabilities), sample_rate)
         data_view.wrap_columns_name('Anomaly')
 
     normalize = True if request.args.get('normalize') else False
+    data_frame = data_view.to_dataframe(DEFAULT_VIEW_TIME_RESAMPLE_RULE, normalize)
 
-    return Response(
-        data_view.to_csv(DEFAULT_VIEW_TIME_RESAMPLE_RULE, normalize),
-        mimetype='text/plain'
+    response = DataFrameResponse(
+        content_type=request.accept_mimetypes.best,
+        data_frame=data_frame,
+        default_response=lambda: Response(data_frame.to_csv(), mimetype='text/plain')
     )
+    return response()
 
 
 @detection_blueprint.route('/<string:task_code>/result/download', methods=['GET'])
@@ -170,10 +257,8 @@ def download_detection_csv(task_code):
     if not detection_result.company_id == g.user.company_id:
         return handle_error(403, "Unauthorised")
 
-    k, x0, anomaly_prior = services.detection.load_calibration_values(detection_task)
-
-    detection_result = services.detection.create_watson_detection_result_from_dictionary(detection_result.result)
-    data_view = DataView.create_from_detection_result(detection_result, k, x0, anomaly_prior)
+    probabilities, sample_rate = services.detection.get_calibrated_probabilities(detection_task)
+    data_view = DataView(pd.DataFrame(probabilities), sample_rate)
 
     data_view.wrap_columns_name('Sensor {}')
 
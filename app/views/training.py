@@ -148,6 +148,15 @@ def submit():
     datasource_configuration_id = g.json.get('datasource_configuration_id')
     parent_training_id = g.json.get('parent_training_id', None)
 
+    incremental = g.json.get('incremental', None)
+    incremental = bool(int(incremental)) if incremental else False
+    try:
+        replay_fraction = float(g.json.get('replay_fraction') or 0)
+    except ValueError:
+        return handle_error(400, 'Invalid replay fraction')
+    if not 0 <= replay_fraction <= 1:
+        return handle_error(400, 'The replay fraction must be between 0 and 1')
+
     if TrainingTaskEntity.query.filter(TrainingTaskEntity.name == name,
                                        TrainingTaskEntity.company_id == company_id).all():
         return handle_error(400, f'Training with name {name} already exists')
@@ -174,6 +183,21 @@ def submit():
     if not datasources_for_train:
         return handle_error(400, f'No valid datasources available for type {datasource_configuration.name}')
 
+    if incremental:
+        parent_task = services.training.get_training_for_id(parent_training_id) if parent_training_id else None
+        if not parent_task or not parent_task.company_id == company_id:
+            return handle_error(400, 'An incremental training needs a parent training')
+
+        new_datasources, replayed_datasources = services.training.select_incremental_datasources(
+            parent_task, datasources_for_train, replay_fraction
+        )
+        if not new_datasources:
+            return handle_error(400, f'No new flights since the training {parent_task.name}')
+
+        logging.info(f"Incremental training on {len(new_datasources)} new flights "
+                     f"and {len(replayed_datasources)} replayed ones")
+        datasources_for_train = new_datasources + replayed_datasources
+
     training_task_code = services.detection.generate_task_code()
 
     training_configuration = services.training.create_training_configuration(
@@ -22,6 +22,7 @@ SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI')
 UPLOAD_ROOT_FOLDER = os.getenv('UPLOAD_ROOT_FOLDER')
 TRAIN_ROOT_FOLDER = os.getenv('TRAIN_ROOT_FOLDER')
 TEMPORARY_UPLOAD_FOLDER = os.path.join(UPLOAD_ROOT_FOLDER, 'temp')
+PROBABILITIES_CACHE_FOLDER = os.path.join(UPLOAD_ROOT_FOLDER, 'probabilities')
 
 ALLOWED_EXTENSIONS = eval(os.getenv('ALLOWED_EXTENSIONS'))
 SECRET_KEY = os.getenv('SECRET_KEY')
@@ -38,4 +39,18 @@ SUPERUSER_EMAIL = os.getenv('SUPERUSER_EMAIL')
 SUPERUSER_PASSWORD = os.getenv('SUPERUSER_PASSWORD')
 DEFAULT_TIME_RESOLUTION = '15T'
 DEFAULT_VIEW_TIME_RESAMPLE_RULE = '1S'
+DETECTIVE_CACHE_SIZE = 2  # restored detectives kept in memory by each worker process, 0 disables the cache
+TRAINING_QUEUE = 'training'  # trainings run on their own worker, recycled after every task
+TRAINING_LOADER_WORKERS = 4  # flights loaded at the same time when a training starts
+STREAMING_TRAINING_DATASOURCE = False  # process the training flights one at a time into a memory mapped file
+FUSED_DETECTION_DIAGNOSTIC = True  # diagnose in the detection task, instead of enqueuing a diagnose task
+DIAGNOSTIC_RADIUS = 1  # chunks diagnosed on each side of an anomalous chunk
+DIAGNOSTIC_NUMBER_OF_HOTSPOTS = 1  # anomalous windows diagnosed per flight
+# diagnose all the chunks in one call: only enable it with detectives whose diagnose accepts and returns
+# a batch of chunks of shape [n_chunks, n_sensors, n_timesteps]
+BATCHED_DIAGNOSTIC = False
+# calibration flights evaluated with a single detect call: calibration needs (1 + batch size) times the memory
+# of the test data, only raise it with detectives whose detect returns one score per chunk
+CALIBRATION_DETECT_BATCH_SIZE = 1
+DOWNSAMPLE_PYRAMID_LEVELS = [1, 10, 60]  # in seconds, the first one must match DEFAULT_VIEW_TIME_RESAMPLE_RULE
 QUEUE_VISIBILITY_TIMEOUT = int(os.getenv('QUEUE_VISIBILITY_TIMEOUT')) #in seconds
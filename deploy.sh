@@ -6,3 +6,4 @@ pip install -r dev-requirements.txt
 flask db upgrade
 sudo systemctl restart api-server
 sudo systemctl restart celery-worker
+sudo systemctl restart celery-training-worker
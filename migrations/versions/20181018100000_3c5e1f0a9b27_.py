@@ -0,0 +1,24 @@
+"""detection result scores as binary
+
+Revision ID: 3c5e1f0a9b27
+Revises: 64ebdc56387f
+Create Date: 2018-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5e1f0a9b27'
+down_revision = '64ebdc56387f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('detection_result', sa.Column('scores', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('detection_result', 'scores')
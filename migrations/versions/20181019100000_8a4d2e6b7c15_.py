@@ -0,0 +1,25 @@
+"""diagnostic result plot payload
+
+Revision ID: 8a4d2e6b7c15
+Revises: 3c5e1f0a9b27
+Create Date: 2018-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4d2e6b7c15'
+down_revision = '3c5e1f0a9b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('diagnostic_result', sa.Column('plot', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade():
+    op.drop_column('diagnostic_result', 'plot')
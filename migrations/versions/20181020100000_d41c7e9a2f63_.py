@@ -0,0 +1,24 @@
+"""diagnostic result plot digest
+
+Revision ID: d41c7e9a2f63
+Revises: 8a4d2e6b7c15
+Create Date: 2018-10-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41c7e9a2f63'
+down_revision = '8a4d2e6b7c15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('diagnostic_result', sa.Column('plot_digest', sa.String(length=40), nullable=True))
+
+
+def downgrade():
+    op.drop_column('diagnostic_result', 'plot_digest')
@@ -0,0 +1,81 @@
+"""
+Compares DataView.to_dict with the previous, per-row implementation on a synthetic flight.
+
+The benchmarks are skipped unless BENCHMARK_HOURS, the length of the flight, is set:
+
+    $ APP_CONFIG=test.env BENCHMARK_HOURS=4 pytest tests/benchmark/test_dataview.py -s
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.interpreters.dataview import DataView
+from config import DEFAULT_VIEW_TIME_RESAMPLE_RULE
+
+BENCHMARK_HOURS = float(os.getenv('BENCHMARK_HOURS', 0))
+RAW_WINDOW_MINUTES = 10  # length of the raw (not resampled) window to serialise
+
+SAMPLE_RATE = 1024
+NUMBER_OF_SENSORS = 8
+
+benchmark = pytest.mark.skipif(not BENCHMARK_HOURS, reason='set BENCHMARK_HOURS to run the benchmarks')
+
+
+def legacy_to_dict(data_frame):
+    datasets = []
+    labels = [str(delta.to_pytimedelta()) for delta in data_frame.index]
+
+    for label, data in data_frame.to_dict().items():
+        datasets.append(
+            {
+                'label': label,
+                'data': [value for _, value in data.items()]
+            }
+        )
+
+    return {
+        'labels': labels,
+        'datasets': datasets
+    }
+
+
+def measure(function, *args):
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+
+def compare(name, data_frame, sample_rate):
+    data_view = DataView(data_frame, sample_rate)
+    indexed_data_frame = data_view.dataframe
+
+    legacy_result, legacy_time = measure(legacy_to_dict, indexed_data_frame)
+    result, vectorised_time = measure(data_view.to_dict)
+
+    assert result == legacy_result
+    print(f"\n{name}: {len(indexed_data_frame)} rows, "
+          f"legacy {legacy_time:.3f}s, vectorised {vectorised_time:.3f}s, "
+          f"speedup {legacy_time / vectorised_time:.1f}x")
+
+
+def create_flight(hours):
+    number_of_timesteps = int(hours * 3600 * SAMPLE_RATE)
+    return pd.DataFrame(np.random.rand(number_of_timesteps, NUMBER_OF_SENSORS).astype(np.float32))
+
+
+@benchmark
+def test_to_dict_of_a_resampled_flight_matches_the_legacy_one():
+    resampled = DataView(create_flight(BENCHMARK_HOURS), SAMPLE_RATE).to_dataframe(DEFAULT_VIEW_TIME_RESAMPLE_RULE)
+
+    compare(f"{BENCHMARK_HOURS}h flight resampled at {DEFAULT_VIEW_TIME_RESAMPLE_RULE}",
+            resampled.reset_index(drop=True), 1)
+
+
+@benchmark
+def test_to_dict_of_a_raw_window_matches_the_legacy_one():
+    raw_window = create_flight(RAW_WINDOW_MINUTES / 60)
+
+    compare(f"{RAW_WINDOW_MINUTES} minutes of raw flight", raw_window, SAMPLE_RATE)
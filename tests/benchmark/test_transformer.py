@@ -0,0 +1,67 @@
+"""
+Compares SimpleTransformer.process_stacked_samples with multiple resample methods against
+one call per method, on a synthetic flight.
+
+The benchmarks are skipped unless BENCHMARK_HOURS, the length of the flight, is set:
+
+    $ APP_CONFIG=test.env BENCHMARK_HOURS=4 pytest tests/benchmark/test_transformer.py -s
+"""
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from app.services.transformer import SimpleTransformer, ENVELOPE_METHODS, ResampleMethod
+
+BENCHMARK_HOURS = float(os.getenv('BENCHMARK_HOURS', 0))
+
+SAMPLE_RATE = 1024
+NUMBER_OF_SENSORS = 8
+NUMBER_OF_TIMESTEPS = 1024
+DOWNSAMPLE_FACTOR = 4
+
+benchmark = pytest.mark.skipif(not BENCHMARK_HOURS, reason='set BENCHMARK_HOURS to run the benchmarks')
+
+
+def one_call_per_method(transformer, flight, resample_methods):
+    return np.stack([
+        SimpleTransformer.create_from_original_transformer(transformer, method).process_stacked_samples(flight)
+        for method in resample_methods
+    ])
+
+
+def multiple_methods(transformer, flight, resample_methods):
+    return transformer.process_stacked_samples(flight, resample_methods)
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+@benchmark
+@pytest.mark.parametrize('with_rms', [False, True])
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_multiple_methods_match_one_call_per_method(with_rms, dtype):
+    resample_methods = list(ENVELOPE_METHODS) + ([ResampleMethod.RMS] if with_rms else [])
+    number_of_chunks = int(BENCHMARK_HOURS * 3600 * SAMPLE_RATE) // NUMBER_OF_TIMESTEPS
+    flight = np.random.rand(NUMBER_OF_SENSORS, number_of_chunks * NUMBER_OF_TIMESTEPS).astype(dtype)
+
+    transformer = SimpleTransformer(NUMBER_OF_TIMESTEPS, NUMBER_OF_SENSORS, DOWNSAMPLE_FACTOR)
+
+    legacy_result, legacy_time, legacy_peak = measure(one_call_per_method, transformer, flight, resample_methods)
+    result, stacked_time, stacked_peak = measure(multiple_methods, transformer, flight, resample_methods)
+
+    assert np.allclose(result, legacy_result, atol=1e-5)
+    print(f"\n{BENCHMARK_HOURS}h flight ({flight.nbytes / 2 ** 20:.0f}MB, {flight.dtype}), "
+          f"{', '.join(method.value for method in resample_methods)}:")
+    print(f"  one call per method {legacy_time:.3f}s, peak {legacy_peak / 2 ** 20:.0f}MB")
+    print(f"  multiple methods    {stacked_time:.3f}s, peak {stacked_peak / 2 ** 20:.0f}MB")
+    print(f"  speedup {legacy_time / stacked_time:.1f}x, memory {legacy_peak / stacked_peak:.1f}x less")
@@ -4,13 +4,18 @@ import os
 from flask import url_for
 from flask_testing import TestCase
 
+from app.core.storage import FlightStore, FlightPyramid
 from app.database import db_session, engine
+from app.entities import TrainingTaskEntity
 from app.entities.base import EntityDeclarativeBase
+from app.entities.customer import CompanyConfigurationEntity
 from app.services.superuser import create_admin
 from app.services.user import generate_confirmation_token
 from config import SUPERUSER_EMAIL, SUPERUSER_PASSWORD
 from tests.test_app import APP
 
+HERE = os.path.join(os.path.dirname(__file__))
+
 
 class BaseTestClass(TestCase):
     TESTING = True
@@ -56,6 +61,8 @@ class BaseTestClass(TestCase):
         uploads = [datasource.location for datasource in DataSourceEntity.query.all()]
         for upload in uploads:
             os.remove(upload)
+            FlightStore(upload).delete()
+            FlightPyramid(upload).delete()
         db_session.close()
         db_session.remove()
 
@@ -159,6 +166,38 @@ class BaseTestClass(TestCase):
         assert resp.status_code == 201
         self.datasource_configuration_id = resp.json['datasource_config']['id']
 
+    def upload_datasource(self, name):
+        with open(os.path.join(HERE, '../resources/test_good_file_fight.hd5'), 'rb') as test_upload_file:
+            resp = self.client.post(
+                url_for('datasource.upload'),
+                content_type='multipart/form-data',
+                data={
+                    'upload': (test_upload_file, 'test_good_file_fight.hd5'), 'name': name,
+                    'datasource_type_id': self.datasource_configuration_id
+                },
+                headers={'Accept': 'application/json'}
+            )
+
+        assert resp.status_code == 201
+        return resp.json['datasource']['upload_code']
+
+    def create_training_task(self, name, company_id=COMPANY_ID):
+        company_configuration = CompanyConfigurationEntity.query.filter(
+            CompanyConfigurationEntity.company_id == self.COMPANY_ID
+        ).first()
+        training_task = TrainingTaskEntity(
+            name=name,
+            task_code=f'{name}_task_code',
+            datasource_configuration_id=self.datasource_configuration_id,
+            company_id=company_id,
+            user_id=company_configuration.user_id,
+            company_configuration_id=company_configuration.id,
+            configuration=self.COMPANY_CONFIGURATION
+        )
+        db_session.add(training_task)
+        db_session.commit()
+        return training_task.task_code
+
     def logout(self):
         resp = self.client.get(
             url_for('authentication.logout')
@@ -0,0 +1,110 @@
+import json
+import struct
+
+import numpy as np
+from flask import url_for
+
+from app.core.content import BINARY_MIMETYPE
+from tests.functional.base_test_class import BaseTestClass
+
+SAMPLE_RATE = 1024
+
+
+class TestDataSourceData(BaseTestClass):
+    TESTING = True
+
+    def setUp(self):
+        super().setUp()
+        self.create_superuser()
+        self.login_superuser()
+        self.register_company()
+        self.register_user()
+        self.set_company_configuration()
+        self.create_datasource_configuration()
+        self.logout()
+        self.login()
+
+        self.upload_code = self.upload_datasource('first_flight')
+
+    def get_data(self, accept='application/json', **query):
+        return self.client.get(
+            url_for('datasource.data', upload_code=self.upload_code, **query),
+            headers={'Accept': accept}
+        )
+
+    def get_raw_data(self, **query):
+        resp = self.get_data(max_points=10 ** 9, **query)
+        assert resp.status_code == 200
+        return resp.json
+
+    def test_data_can_be_windowed_in_time(self):
+        flight = self.get_raw_data()
+        number_of_timesteps = len(flight['labels'])
+        first_timestep, last_timestep = number_of_timesteps // 4, number_of_timesteps // 2
+
+        window = self.get_raw_data(start=first_timestep / SAMPLE_RATE, end=last_timestep / SAMPLE_RATE)
+
+        assert len(window['labels']) == last_timestep - first_timestep
+        for window_dataset, flight_dataset in zip(window['datasets'], flight['datasets']):
+            assert window_dataset['label'] == flight_dataset['label']
+            assert window_dataset['data'] == flight_dataset['data'][first_timestep:last_timestep]
+
+    def test_data_can_be_restricted_to_some_sensors(self):
+        flight = self.get_raw_data()
+
+        subset = self.get_raw_data(sensors='2,0')
+
+        assert subset['labels'] == flight['labels']
+        assert subset['datasets'] == [flight['datasets'][2], flight['datasets'][0]]
+
+        resp = self.get_data(sensors=str(len(flight['datasets'])))
+        assert resp.status_code == 400
+
+        resp = self.get_data(sensors='first')
+        assert resp.status_code == 400
+
+    def test_data_is_downsampled_to_max_points(self):
+        number_of_timesteps = len(self.get_raw_data()['labels'])
+
+        resp = self.get_data(max_points=1, statistic='min')
+        assert resp.status_code == 200
+        minimum = resp.json
+
+        resp = self.get_data(max_points=1, statistic='max')
+        assert resp.status_code == 200
+        maximum = resp.json
+
+        assert len(minimum['labels']) < number_of_timesteps
+        assert minimum['labels'] == maximum['labels']
+        for minimum_dataset, maximum_dataset in zip(minimum['datasets'], maximum['datasets']):
+            assert np.all(np.array(minimum_dataset['data']) <= np.array(maximum_dataset['data']))
+
+        resp = self.get_data(statistic='median')
+        assert resp.status_code == 400
+
+    def test_data_can_be_served_as_binary(self):
+        flight = self.get_raw_data()
+
+        resp = self.get_data(accept=BINARY_MIMETYPE, max_points=10 ** 9)
+
+        assert resp.status_code == 200
+        assert resp.mimetype == BINARY_MIMETYPE
+
+        payload = resp.data
+        header_length, = struct.unpack('<I', payload[:4])
+        header = json.loads(payload[4:4 + header_length].decode('utf-8'))
+        number_of_rows = header['number_of_rows']
+        number_of_columns = len(header['columns'])
+        assert (4 + header_length) % 8 == 0
+
+        assert header['columns'] == [dataset['label'] for dataset in flight['datasets']]
+        assert number_of_rows == len(flight['labels'])
+        assert header['index']['unit'] == 'seconds'
+
+        index = np.frombuffer(payload, dtype='<f8', count=number_of_rows, offset=4 + header_length)
+        data = np.frombuffer(
+            payload, dtype='<f4', count=number_of_rows * number_of_columns, offset=4 + header_length + index.nbytes
+        ).reshape(number_of_columns, number_of_rows)
+
+        np.testing.assert_allclose(index, np.arange(number_of_rows) / SAMPLE_RATE)
+        np.testing.assert_allclose(data, [dataset['data'] for dataset in flight['datasets']])
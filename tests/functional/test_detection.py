@@ -0,0 +1,126 @@
+import json
+
+from flask import url_for
+
+from app.entities import DataSourceEntity, DetectionTaskEntity
+from app.entities.datasource import DataSourceConfigurationEntity, LabelTypes
+from tests.functional.base_test_class import BaseTestClass
+
+
+class TestBulkDetection(BaseTestClass):
+    TESTING = True
+
+    def setUp(self):
+        super().setUp()
+        self.create_superuser()
+        self.login_superuser()
+        self.register_company()
+        self.register_user()
+        self.set_company_configuration()
+        self.create_datasource_configuration()
+        self.logout()
+        self.login()
+
+        self.first_upload_code = self.upload_datasource('first_flight')
+        self.second_upload_code = self.upload_datasource('second_flight')
+        self.training_task_code = self.create_training_task('training')
+
+    def submit_bulk(self, data):
+        return self.client.post(
+            url_for('detection.submit_bulk'),
+            content_type='application/json',
+            data=json.dumps(data),
+            headers={'Accept': 'application/json'}
+        )
+
+    def test_bulk_detection_requires_authentication(self):
+        self.logout()
+
+        resp = self.submit_bulk({'training_task_code': self.training_task_code})
+
+        assert resp.status_code == 401
+        assert not DetectionTaskEntity.query.all()
+
+    def test_bulk_detection_runs_on_all_the_flights_of_the_training(self):
+        resp = self.submit_bulk({'training_task_code': self.training_task_code, 'name': 'bulk'})
+
+        assert resp.status_code == 200
+        detection_tasks = resp.json['detection_tasks']
+        assert {task['upload_code'] for task in detection_tasks} == {self.first_upload_code, self.second_upload_code}
+        assert {task.name for task in DetectionTaskEntity.query.all()} == {'bulk - first_flight', 'bulk - second_flight'}
+
+    def test_bulk_detection_accepts_comma_separated_upload_codes(self):
+        resp = self.submit_bulk({
+            'training_task_code': self.training_task_code,
+            'upload_codes': f' {self.first_upload_code}, {self.second_upload_code},'
+        })
+
+        assert resp.status_code == 200
+        upload_codes = [task['upload_code'] for task in resp.json['detection_tasks']]
+        assert upload_codes == [self.first_upload_code, self.second_upload_code]
+
+    def test_bulk_detection_accepts_a_list_of_upload_codes(self):
+        resp = self.submit_bulk({
+            'training_task_code': self.training_task_code,
+            'upload_codes': [self.second_upload_code]
+        })
+
+        assert resp.status_code == 200
+        upload_codes = [task['upload_code'] for task in resp.json['detection_tasks']]
+        assert upload_codes == [self.second_upload_code]
+
+    def test_bulk_detection_can_filter_the_flights_by_label(self):
+        datasource = DataSourceEntity.query.filter(DataSourceEntity.upload_code == self.first_upload_code).one()
+        datasource.label = LabelTypes.ABNORMAL
+        datasource.update()
+
+        resp = self.submit_bulk({'training_task_code': self.training_task_code, 'label': 'ABNORMAL'})
+
+        assert resp.status_code == 200
+        upload_codes = [task['upload_code'] for task in resp.json['detection_tasks']]
+        assert upload_codes == [self.first_upload_code]
+
+        resp = self.submit_bulk({'training_task_code': self.training_task_code, 'label': 'NORMAL'})
+        assert resp.status_code == 400
+
+        resp = self.submit_bulk({'training_task_code': self.training_task_code, 'label': 'UNKNOWN'})
+        assert resp.status_code == 400
+
+    def test_bulk_detection_needs_an_existing_training_and_flights(self):
+        resp = self.submit_bulk({'training_task_code': 'not_a_training'})
+        assert resp.status_code == 404
+
+        resp = self.submit_bulk({
+            'training_task_code': self.training_task_code,
+            'upload_codes': [self.first_upload_code, 'not_a_flight']
+        })
+        assert resp.status_code == 404
+
+        assert not DetectionTaskEntity.query.all()
+
+    def test_bulk_detection_is_forbidden_on_the_trainings_of_other_companies(self):
+        other_training_task_code = self.create_training_task('other_training', company_id=1)
+
+        resp = self.submit_bulk({'training_task_code': other_training_task_code})
+
+        assert resp.status_code == 403
+        assert not DetectionTaskEntity.query.all()
+
+    def test_bulk_detection_rejects_flights_of_another_datasource_configuration(self):
+        other_datasource_configuration = DataSourceConfigurationEntity(
+            company_id=self.COMPANY_ID,
+            name='Other Datasource Config',
+            meta={'sample_rate': 1024, 'number_of_sensors': 4}
+        )
+        other_datasource_configuration.save()
+        datasource = DataSourceEntity.query.filter(DataSourceEntity.upload_code == self.second_upload_code).one()
+        datasource.datasource_configuration_id = other_datasource_configuration.id
+        datasource.update()
+
+        resp = self.submit_bulk({
+            'training_task_code': self.training_task_code,
+            'upload_codes': [self.first_upload_code, self.second_upload_code]
+        })
+
+        assert resp.status_code == 400
+        assert not DetectionTaskEntity.query.all()
@@ -0,0 +1,91 @@
+from flask import url_for
+
+from app import services
+from app.database import db_session
+from app.entities import DataSourceEntity
+from app.entities.diagnostic import DiagnosticTaskEntity, DiagnosticResultEntity
+from tests.functional.base_test_class import BaseTestClass
+
+
+class TestDiagnosticPlot(BaseTestClass):
+    TESTING = True
+
+    def setUp(self):
+        super().setUp()
+        self.create_superuser()
+        self.login_superuser()
+        self.register_company()
+        self.register_user()
+        self.set_company_configuration()
+        self.create_datasource_configuration()
+        self.logout()
+        self.login()
+
+        upload_code = self.upload_datasource('first_flight')
+        training_task_code = self.create_training_task('training')
+        self.detection_task_code = self.create_diagnostic(upload_code, training_task_code)
+
+    def create_diagnostic(self, upload_code, training_task_code):
+        datasource = DataSourceEntity.query.filter(DataSourceEntity.upload_code == upload_code).one()
+        training_task = services.training.get_training_for_task_code(training_task_code)
+        detection_task = services.detection.trigger_detection('detection', datasource, training_task, datasource.user_id)
+
+        diagnostic_task = DiagnosticTaskEntity(
+            detection_task_id=detection_task.id,
+            company_id=datasource.company_id,
+            datasource_id=datasource.id,
+            upload_code=upload_code,
+            task_code=detection_task.task_code
+        )
+        db_session.add(diagnostic_task)
+        db_session.commit()
+
+        diagnostic_result = DiagnosticResultEntity(
+            company_id=datasource.company_id,
+            upload_code=upload_code,
+            task_code=detection_task.task_code,
+            result=[{'chunk_index': 0}],
+            plot=[{'chunk_index': 0, 'chunk_timedelta': '0:00:00'}],
+            diagnostic_task_id=diagnostic_task.id
+        )
+        db_session.add(diagnostic_result)
+        db_session.commit()
+
+        return detection_task.task_code
+
+    def test_plot_is_served_with_an_etag(self):
+        resp = self.client.get(
+            url_for('diagnostic.for_plot', detection_task_code=self.detection_task_code),
+            headers={'Accept': 'application/json'}
+        )
+
+        assert resp.status_code == 200
+        assert resp.json['diagnostic']['diagnostic_result']['result'] == [
+            {'chunk_index': 0, 'chunk_timedelta': '0:00:00'}
+        ]
+        etag = resp.headers.get('ETag')
+        assert etag == '"{}"'.format(DiagnosticResultEntity.query.one().plot_digest)
+
+        resp = self.client.get(
+            url_for('diagnostic.for_plot', detection_task_code=self.detection_task_code),
+            headers={'Accept': 'application/json', 'If-None-Match': etag}
+        )
+
+        assert resp.status_code == 304
+        assert not resp.data
+
+        resp = self.client.get(
+            url_for('diagnostic.for_plot', detection_task_code=self.detection_task_code),
+            headers={'Accept': 'application/json', 'If-None-Match': '"stale"'}
+        )
+
+        assert resp.status_code == 200
+        assert resp.headers.get('ETag') == etag
+
+    def test_plot_of_a_missing_diagnostic(self):
+        resp = self.client.get(
+            url_for('diagnostic.for_plot', detection_task_code='not_a_detection'),
+            headers={'Accept': 'application/json'}
+        )
+
+        assert resp.status_code == 404
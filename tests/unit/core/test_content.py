@@ -0,0 +1,49 @@
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+from app.core.content import data_frame_to_binary, BINARY_ALIGNMENT
+
+
+def _decode(payload):
+    header_length, = struct.unpack_from('<I', payload)
+    header = json.loads(payload[4:4 + header_length].decode('utf-8'))
+    offset = 4 + header_length
+    assert offset % BINARY_ALIGNMENT == 0
+
+    number_of_rows = header['number_of_rows']
+    index = None
+    if 'labels' not in header['index']:
+        index = np.frombuffer(payload, dtype=header['index']['dtype'], count=number_of_rows, offset=offset)
+        offset += index.nbytes
+
+    data = np.frombuffer(payload, dtype=header['dtype'], offset=offset)
+    return header, index, data.reshape(len(header['columns']), number_of_rows)
+
+
+def test_data_frame_to_binary_timedelta_index():
+    data_frame = pd.DataFrame(
+        np.random.rand(10, 3),
+        columns=['a', 'b', 'c'],
+        index=pd.timedelta_range(start=0, periods=10, freq='500ms')
+    )
+
+    header, index, data = _decode(data_frame_to_binary(data_frame))
+
+    assert header['columns'] == ['a', 'b', 'c']
+    assert header['index']['unit'] == 'seconds'
+    assert np.allclose(index, np.arange(10) * 0.5)
+    assert np.allclose(data, data_frame.values.T)
+
+
+def test_data_frame_to_binary_label_index():
+    data_frame = pd.DataFrame(np.random.rand(4, 2), columns=[0, 1], index=['w', 'x', 'y', 'z'])
+
+    header, index, data = _decode(data_frame_to_binary(data_frame))
+
+    assert header['columns'] == ['0', '1']
+    assert header['index']['labels'] == ['w', 'x', 'y', 'z']
+    assert index is None
+    assert np.allclose(data, data_frame.values.T)
@@ -0,0 +1,102 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.storage import (
+    FlightStore, FlightPyramid, FlightNotPreparedError, open_flight_store, open_flight_pyramid, create_temporary_location
+)
+from tests import RESOURCE_DIR
+
+
+def test_flight_store_from_dataframe(tmpdir):
+    location = str(tmpdir.join('flight.hdf5'))
+    dataframe = pd.DataFrame(np.random.rand(100, 3))
+
+    store = FlightStore.from_dataframe(location, dataframe, block_size=7)
+
+    assert store.exists()
+    assert store.columns == [0, 1, 2]
+    assert store.data.shape == (3, 100)
+    assert store.data.dtype == np.float32
+
+    read_dataframe = store.read()
+    np.testing.assert_array_almost_equal(read_dataframe.values, dataframe.values)
+
+    partial = store.read(start=10, stop=20, columns=[2, 0])
+    assert list(partial.columns) == [2, 0]
+    assert list(partial.index) == list(range(10, 20))
+    np.testing.assert_array_almost_equal(partial.values, dataframe.values[10:20, [2, 0]])
+
+    store.delete()
+    assert not store.exists()
+
+
+def test_flight_store_from_hdf(tmpdir):
+    location = str(tmpdir.join('flight.hdf5'))
+    shutil.copy(os.path.join(RESOURCE_DIR, 'test_good_file_fight.hd5'), location)
+
+    with pd.HDFStore(location, 'r') as hdf_store:
+        original = hdf_store['df1']
+
+    store = FlightStore.from_hdf(location, key='df1', block_size=1000)
+
+    assert store.data.shape == (original.shape[1], original.shape[0])
+    np.testing.assert_array_almost_equal(store.read().values, original.values.astype(np.float32))
+
+    assert open_flight_store(location).columns == store.columns
+
+
+def test_flight_pyramid(tmpdir):
+    location = str(tmpdir.join('flight.hdf5'))
+    sample_rate = 4
+    data = np.random.rand(sample_rate * 10 + 2, 2)  # 10 seconds and a half-filled bin
+    store = FlightStore.from_dataframe(location, pd.DataFrame(data))
+
+    pyramid = FlightPyramid.from_store(store, sample_rate, levels=[1, 5])
+
+    assert pyramid.exists()
+    assert pyramid.get_level(1).shape == (3, 2, 11)
+    assert pyramid.get_level(5).shape == (3, 2, 3)
+
+    np.testing.assert_array_almost_equal(pyramid.read_array(1, 'mean')[:, 0], data[0:4].mean(axis=0))
+    np.testing.assert_array_almost_equal(pyramid.read_array(1, 'max')[:, 10], data[40:].max(axis=0))
+    np.testing.assert_array_almost_equal(pyramid.read_array(5, 'min')[:, 1], data[20:40].min(axis=0))
+    np.testing.assert_array_almost_equal(pyramid.read_array(5, 'mean', sensor_indexes=[1])[:, 2], [data[40:, 1].mean()])
+
+    assert pyramid.select_level(duration=10) == 1
+    assert pyramid.select_level(duration=10, max_points=20) == 1
+    assert pyramid.select_level(duration=10, max_points=5) == 5
+    assert pyramid.select_level(duration=10, max_points=1) == 5
+
+    pyramid.delete()
+    assert not pyramid.exists()
+
+
+def test_missing_flight_store_is_only_built_when_requested(tmpdir):
+    location = str(tmpdir.join('flight.hdf5'))
+    shutil.copy(os.path.join(RESOURCE_DIR, 'test_good_file_fight.hd5'), location)
+
+    with pytest.raises(FlightNotPreparedError):
+        open_flight_store(location, build_missing=False)
+    with pytest.raises(FlightNotPreparedError):
+        open_flight_pyramid(location, 1024, build_missing=False)
+    assert not FlightStore(location).exists()
+
+    assert open_flight_store(location).exists()
+    assert open_flight_store(location, build_missing=False).exists()
+
+
+def test_temporary_locations_are_unique_and_removed(tmpdir):
+    location = str(tmpdir.join('flight.hdf5'))
+
+    first, second = create_temporary_location(location), create_temporary_location(location)
+    assert first != second
+    assert os.path.dirname(first) == str(tmpdir)
+
+    FlightStore.from_dataframe(location, pd.DataFrame(np.random.rand(10, 2)))
+    assert sorted(os.listdir(str(tmpdir))) == sorted(
+        [os.path.basename(first), os.path.basename(second), 'flight.hdf5.json', 'flight.hdf5.npy']
+    )
@@ -0,0 +1,36 @@
+from flask import Flask
+
+from app.core.utils import request_memoize
+
+
+class Model:
+    def __init__(self, id):
+        self.id = id
+
+
+def test_request_memoize():
+    calls = []
+
+    @request_memoize('derived')
+    def derive(model):
+        calls.append(model.id)
+        return [model.id]
+
+    flask_app = Flask(__name__)
+
+    with flask_app.test_request_context():
+        first = derive(Model(1))
+        assert derive(Model(1)) is first
+        derive(Model(2))
+        derive(Model(None))
+        derive(Model(None))
+    assert calls == [1, 2, None, None]
+
+    # every request builds its own objects
+    with flask_app.test_request_context():
+        assert derive(Model(1)) is not first
+    assert calls == [1, 2, None, None, 1]
+
+    # out of a request nothing is memoised
+    derive(Model(1))
+    assert calls == [1, 2, None, None, 1, 1]
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from app.interpreters.datasource import base
+from app.interpreters.datasource.base import AbstractDatasourceInterpreter, InterpreterResult
+
+
+class DataFrameInterpreter(AbstractDatasourceInterpreter):
+
+    def __init__(self, dataframe, errors=None):
+        self.dataframe = dataframe
+        self.errors = errors or []
+
+    def from_upload_to_dataframe(self, uploaded_file, datasource_type_id):
+        return InterpreterResult(self.dataframe, self.errors)
+
+
+class DummyUpload:
+    filename = 'flight.csv'
+
+
+def test_from_upload_to_file_falls_back_on_the_dataframe(tmpdir, monkeypatch):
+    monkeypatch.setattr(base, 'TEMPORARY_UPLOAD_FOLDER', str(tmpdir))
+    dataframe = pd.DataFrame(np.random.rand(20, 3))
+
+    uploaded_flight, errors = DataFrameInterpreter(dataframe).from_upload_to_file(DummyUpload(), 1)
+
+    assert errors == []
+    assert (uploaded_flight.number_of_rows, uploaded_flight.number_of_columns) == (20, 3)
+    with pd.HDFStore(uploaded_flight.location, 'r') as store:
+        np.testing.assert_array_almost_equal(store[uploaded_flight.key].values, dataframe.values)
+
+
+def test_from_upload_to_file_returns_the_dataframe_errors():
+    uploaded_flight, errors = DataFrameInterpreter(pd.DataFrame(), ['Wrong shape']).from_upload_to_file(DummyUpload(), 1)
+
+    assert uploaded_flight is None
+    assert errors == ['Wrong shape']
@@ -6,7 +6,8 @@ import pandas as pd
 from alphai_watson.datasource import AbstractDataSource
 from alphai_watson.detective import DetectionResult
 
-from app.interpreters.dataview import DataView
+from app.core.storage import FlightStore, FlightPyramid
+from app.interpreters.dataview import DataView, data_frame_to_dict
 from tests import RESOURCE_DIR
 
 
@@ -36,6 +37,26 @@ class DummyDataSource:
         }
 
 
+class DummyStoredDataSource:
+
+    def __init__(self, location, dataframe, sample_rate):
+        self.sample_rate = sample_rate
+        self._store = FlightStore.from_dataframe(location, dataframe)
+        self._pyramid = FlightPyramid.from_store(self._store, sample_rate, levels=[1, 10])
+
+    def get_store(self, build_missing=True):
+        return self._store
+
+    def get_pyramid(self, build_missing=True):
+        return self._pyramid
+
+    @property
+    def meta(self):
+        return {
+            'sample_rate': self.sample_rate
+        }
+
+
 class DummyDetectionResult(DetectionResult):
 
     def __init__(self, data, timesteps_per_chunk, original_sample_rate):
@@ -130,6 +151,33 @@ def test_data_view_to_dict():
     assert data_dict['datasets'][0]['label'] == 'Sensor 0'
 
 
+def test_data_view_to_dict_matches_timedelta_formatting():
+    sample_rate = 1024
+
+    data_view = DataView(
+        pd.DataFrame(np.random.rand(sample_rate * 3, 2)),
+        sample_rate
+    )
+
+    data_frame = data_view.dataframe
+    data_dict = data_view.to_dict()
+
+    assert data_dict['labels'] == [str(delta.to_pytimedelta()) for delta in data_frame.index]
+    assert data_dict['datasets'][1]['data'] == list(data_frame[1].values)
+
+
+
+def test_data_frame_to_dict_matches_data_view_to_dict():
+    sample_rate = 4
+
+    data_view = DataView(
+        pd.DataFrame(np.random.rand(sample_rate * 3, 2)),
+        sample_rate
+    )
+
+    assert data_frame_to_dict(data_view.to_dataframe(normalize=True)) == data_view.to_dict(normalize=True)
+
+
 def test_data_view_merge():
     sample_rate = 1
 
@@ -150,3 +198,26 @@ def test_data_view_merge():
     merged = datasource_view + detection_result_view
 
     assert list(merged.dataframe.columns) == ['Sensor 0', 'Result 0']
+
+
+def test_create_from_flight(tmpdir):
+    sample_rate = 8
+    data = np.random.rand(sample_rate * 60, 3)
+    datasource = DummyStoredDataSource(str(tmpdir.join('flight.hdf5')), pd.DataFrame(data), sample_rate)
+
+    whole_flight = DataView.create_from_flight(datasource)
+    assert whole_flight.dataframe.shape == (60, 3)
+    assert whole_flight.dataframe.index[1] == pd.Timedelta(seconds=1)
+
+    downsampled = DataView.create_from_flight(datasource, max_points=10)
+    assert downsampled.dataframe.shape == (6, 3)
+
+    window = DataView.create_from_flight(datasource, start=2, end=4, sensors=[1], max_points=100)
+    assert list(window.dataframe.columns) == [1]
+    assert window.dataframe.shape == (16, 1)
+    assert window.dataframe.index[0] == pd.Timedelta(seconds=2)
+    np.testing.assert_array_almost_equal(window.dataframe.values[:, 0], data[16:32, 1])
+
+    downsampled_window = DataView.create_from_flight(datasource, start=2.5, end=4, sensors=[0, 2], max_points=10)
+    assert downsampled_window.dataframe.shape == (2, 2)
+    assert downsampled_window.dataframe.index[0] == pd.Timedelta(seconds=2)
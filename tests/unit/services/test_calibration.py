@@ -0,0 +1,97 @@
+import numpy as np
+from alphai_watson.detective import DetectionResult as DetectiveDetectionResult
+
+from app.services import calibration
+
+
+class DummySample:
+
+    def __init__(self, data):
+        self.data = data
+        self.type = 'NORMAL'
+
+
+def test_contaminations_match_the_original_definitions():
+    flight = np.random.rand(5, 4, 6).astype(np.float32)
+
+    amplitude = calibration._add_amplitude_contamination(flight, 0.5)
+    assert np.allclose(amplitude, (flight + 0.5 * np.roll(flight, shift=1, axis=1)) / 1.5)
+
+    places_to_shift = int(flight.shape[1] * 0.5)
+    timeshift = calibration._add_timeshift_contamination(flight, 0.5)
+    assert np.allclose(timeshift, (flight + np.roll(flight, shift=places_to_shift, axis=1)) / 2)
+
+    assert np.allclose(calibration._add_multiplicative_contamination(flight, 1.5), flight * 1.5)
+
+
+def test_abnormal_flights_reuse_one_buffer():
+    test_data = DummySample(np.random.rand(5, 4, 6).astype(np.float32))
+    contaminations = calibration._get_contaminations()
+
+    batch_sizes = []
+    buffers = set()
+    for batch_number, (batch_data, batch_samples) in enumerate(
+            calibration.generate_abnormal_flights(test_data, batch_size=4)):
+        batch_sizes.append(len(batch_samples))
+        buffers.add(batch_data.__array_interface__['data'][0])
+
+        for position, (flight_data, sample) in enumerate(zip(batch_data, batch_samples)):
+            contaminate, parameter = contaminations[batch_number * 4 + position]
+            assert sample.type == 'ABNORMAL'
+            assert np.shares_memory(sample.data, flight_data)
+            assert np.allclose(sample.data, contaminate(test_data.data, parameter))
+
+    assert batch_sizes == [4, 4, 4, 1]
+    assert len(buffers) == 1
+    assert test_data.type == 'NORMAL'
+
+
+def test_abnormal_flights_are_built_one_at_a_time_by_default():
+    test_data = DummySample(np.random.rand(5, 4, 6).astype(np.float32))
+
+    batch_sizes = [len(batch_samples) for _, batch_samples in calibration.generate_abnormal_flights(test_data)]
+
+    assert batch_sizes == [1] * len(calibration._get_contaminations())
+
+
+class ChunkScoringDetective:
+    """ Scores every chunk with its mean, as a detective returning one score per chunk """
+
+    def __init__(self):
+        self.detected_shapes = []
+
+    def detect(self, sample):
+        self.detected_shapes.append(sample.data.shape)
+        return DetectiveDetectionResult(sample.data.mean(axis=(1, 2)), 6, 1024)
+
+
+class FlightScoringDetective(ChunkScoringDetective):
+    """ Returns a single score, which can't be split per flight """
+
+    def detect(self, sample):
+        self.detected_shapes.append(sample.data.shape)
+        return DetectiveDetectionResult(np.array([sample.data.mean()]), 6, 1024)
+
+
+def test_detect_batch_splits_the_scores_per_flight():
+    test_data = DummySample(np.random.rand(5, 4, 6).astype(np.float32))
+    batch_data, batch_samples = next(calibration.generate_abnormal_flights(test_data, batch_size=3))
+    detective = ChunkScoringDetective()
+
+    results = calibration._detect_batch(detective, test_data, batch_data, batch_samples)
+
+    assert detective.detected_shapes == [(15, 4, 6)]
+    assert len(results) == 3
+    for result, sample in zip(results, batch_samples):
+        assert np.allclose(result.data, sample.data.mean(axis=(1, 2)))
+
+
+def test_detect_batch_falls_back_to_a_call_per_flight():
+    test_data = DummySample(np.random.rand(5, 4, 6).astype(np.float32))
+    batch_data, batch_samples = next(calibration.generate_abnormal_flights(test_data, batch_size=3))
+    detective = FlightScoringDetective()
+
+    results = calibration._detect_batch(detective, test_data, batch_data, batch_samples)
+
+    assert detective.detected_shapes == [(15, 4, 6), (5, 4, 6), (5, 4, 6), (5, 4, 6)]
+    assert len(results) == 3
@@ -0,0 +1,35 @@
+import pytest
+
+from app import services
+
+
+class DummyUploadManager:
+
+    def __init__(self, saved_path):
+        self.saved_path = saved_path
+        self.cleaned_up = []
+
+    def store(self, uploaded_data, company_id, upload_code):
+        return self.saved_path
+
+    def cleanup(self, location):
+        self.cleaned_up.append(location)
+
+
+class DummyDatasourceConfiguration:
+    id = 1
+    meta = {'sample_rate': 1024}
+
+
+def test_failed_pyramid_cleans_up_the_stored_flight(monkeypatch):
+    def open_flight_pyramid(location, sample_rate):
+        raise IOError("No space left on device")
+
+    monkeypatch.setattr(services.datasource, 'get_configuration_by_id', lambda _: DummyDatasourceConfiguration())
+    monkeypatch.setattr(services.datasource, 'open_flight_pyramid', open_flight_pyramid)
+    upload_manager = DummyUploadManager('/uploads/2/upload_code.hdf5')
+
+    with pytest.raises(IOError):
+        services.datasource.save_datasource('flight', 2, 1, 'upload_code', upload_manager, None, None)
+
+    assert upload_manager.cleaned_up == ['/uploads/2/upload_code.hdf5']
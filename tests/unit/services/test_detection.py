@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+from alphai_watson.detective import DetectionResult as DetectiveDetectionResult
+
+from app import services
+from app.entities import DetectionResultEntity, DetectionTaskEntity, TrainingTaskEntity
+
+
+def test_detection_result_scores_round_trip():
+    detection = DetectiveDetectionResult(np.random.rand(50).astype(np.float32), 10, 1024)
+
+    result, scores = services.detection.serialize_watson_detection_result(detection)
+
+    assert 'data' not in result
+    assert result['timesteps_per_chunk'] == 10
+
+    entity = DetectionResultEntity(result=result, scores=scores)
+    loaded = services.detection.create_watson_detection_result(entity)
+
+    assert np.array_equal(loaded.data, detection.data)
+    assert loaded.data.dtype == np.float32
+    assert loaded.original_sample_rate == 1024
+
+
+def test_detection_result_from_legacy_json():
+    entity = DetectionResultEntity(
+        result={'data': [0.1, 0.2, 0.3], 'timesteps_per_chunk': 10, 'original_sample_rate': 1024}
+    )
+
+    loaded = services.detection.create_watson_detection_result(entity)
+
+    assert np.allclose(loaded.data, [0.1, 0.2, 0.3])
+
+
+def test_add_scores_to_result():
+    detection = DetectiveDetectionResult(np.random.rand(50).astype(np.float32), 10, 1024)
+    result, scores = services.detection.serialize_watson_detection_result(detection)
+
+    full_result = services.detection.add_scores_to_result(DetectionResultEntity(result=result, scores=scores))
+
+    assert np.array_equal(full_result['data'], detection.data)
+    assert full_result['timesteps_per_chunk'] == 10
+    assert 'data' not in result
+
+    legacy_result = {'data': [0.1, 0.2], 'timesteps_per_chunk': 10, 'original_sample_rate': 1024}
+    assert services.detection.add_scores_to_result(DetectionResultEntity(result=legacy_result)) == legacy_result
+
+
+def test_cached_probabilities(tmpdir, monkeypatch):
+    monkeypatch.setattr(services.detection, 'PROBABILITIES_CACHE_FOLDER', str(tmpdir))
+    detection = DetectiveDetectionResult(np.random.rand(50).astype(np.float32), 10, 1024)
+    detection_task = DetectionTaskEntity(
+        task_code='detection',
+        training_task=TrainingTaskEntity(configuration={'calibration': {'k': 1., 'x0': 0.5, 'anomaly_prior': 0.1}})
+    )
+
+    probabilities, sample_rate = services.detection.cache_probabilities(detection_task, detection)
+    cached_probabilities, cached_sample_rate = services.detection.get_calibrated_probabilities(detection_task)
+
+    assert np.array_equal(cached_probabilities, probabilities)
+    assert cached_sample_rate == sample_rate
+
+    detection_task.training_task.configuration['calibration']['k'] = 2.
+    recalibrated_location = services.detection.get_probabilities_cache_location(
+        'detection', services.detection.load_calibration_values(detection_task)
+    )
+    assert not os.path.exists(recalibrated_location)
+
+    # caching with the new calibration removes the probabilities of the old one
+    services.detection.cache_probabilities(detection_task, detection)
+    assert [location.strpath for location in tmpdir.listdir()] == [recalibrated_location]
+
+    services.detection.delete_cached_probabilities('detection')
+    assert not tmpdir.listdir()
@@ -0,0 +1,39 @@
+import os
+
+from app import services
+
+
+class DummyDetective:
+
+    def __init__(self, model_configuration):
+        self.model_configuration = model_configuration
+
+
+class DummyTrainingTask:
+
+    def __init__(self, task_code, load_path):
+        self.task_code = task_code
+        self.configuration = {
+            'model': {
+                'class_name': 'tests.unit.services.test_detective.DummyDetective',
+                'configuration': {'model_configuration': {'load_path': load_path, 'save_path': load_path}}
+            }
+        }
+
+
+def test_get_detective_is_cached_until_the_checkpoint_changes(tmpdir):
+    services.detective.clear_detective_cache()
+    load_path = str(tmpdir.join('model'))
+    checkpoint = tmpdir.join('model.index')
+    checkpoint.write('checkpoint')
+
+    training_task = DummyTrainingTask('training', load_path)
+    detective = services.detective.get_detective(training_task)
+
+    assert isinstance(detective, DummyDetective)
+    assert services.detective.get_detective(training_task) is detective
+
+    os.utime(str(checkpoint), (0, os.path.getmtime(str(checkpoint)) + 10))
+
+    assert services.detective.get_detective(training_task) is not detective
+    services.detective.clear_detective_cache()
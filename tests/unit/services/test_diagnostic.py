@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import services
+
+
+def test_find_most_anomalous_windows():
+    probabilities = np.array([0.1, 0.9, 0.2, 0.1, 0.1, 0.8, 0.3, 0.1, 0.95, 0.1])
+
+    windows = services.diagnostic.find_most_anomalous_windows(probabilities, radius=1, number_of_windows=3)
+
+    assert windows == [range(7, 10), range(0, 3), range(4, 7)]
+
+
+def test_find_most_anomalous_windows_are_disjoint():
+    probabilities = np.array([0.1, 0.9, 0.85, 0.1, 0.1])
+
+    windows = services.diagnostic.find_most_anomalous_windows(probabilities, radius=1, number_of_windows=2)
+
+    assert windows == [range(0, 3)]
+
+
+def test_find_most_anomalous_windows_at_the_edges():
+    probabilities = np.array([0.9, 0.1, 0.1, 0.1, 0.8])
+
+    windows = services.diagnostic.find_most_anomalous_windows(probabilities, radius=1, number_of_windows=2)
+
+    assert windows == [range(0, 3)]
+    assert services.diagnostic.find_most_anomalous_windows(probabilities, radius=0, number_of_windows=2) == [
+        range(0, 1), range(4, 5)
+    ]
+
+
+
+def test_find_most_anomalous_windows_ignores_missing_probabilities():
+    probabilities = np.array([0.1, np.nan, 0.9, 0.1, 0.1, np.nan, 0.8])
+
+    windows = services.diagnostic.find_most_anomalous_windows(probabilities, radius=1, number_of_windows=2)
+
+    assert windows == [range(1, 4), range(4, 7)]
+    assert services.diagnostic.find_most_anomalous_windows(np.full(5, np.nan), radius=1, number_of_windows=2) == []
+
+
+
+def test_digest_plot_payload():
+    plot_payload = [{'chunk_index': 0, 'chunk_timedelta': '0:00:00'}]
+
+    digest = services.diagnostic.digest_plot_payload(plot_payload)
+
+    assert digest == services.diagnostic.digest_plot_payload([{'chunk_timedelta': '0:00:00', 'chunk_index': 0}])
+    assert digest != services.diagnostic.digest_plot_payload([{'chunk_index': 1, 'chunk_timedelta': '0:00:00'}])
+
+
+class DummySample:
+
+    def __init__(self, data):
+        self.data = data  # [n_chunks, n_sensors, n_timesteps]
+
+    def get_chunk(self, chunk_index):
+        return self.data[chunk_index]
+
+    def get_timedelta_for_chunk(self, chunk_index):
+        return chunk_index
+
+
+class BatchDetective:
+
+    def __init__(self):
+        self.calls = []
+
+    def diagnose(self, chunks):
+        self.calls.append(chunks.shape)
+        return chunks * 2
+
+
+class SingleChunkDetective(BatchDetective):
+
+    def diagnose(self, chunk):
+        return super().diagnose(chunk).ravel()
+
+
+def _assert_diagnosed(sample, results):
+    assert [result.chunk_index for result in results] == [2, 3, 4]
+    for result in results:
+        assert np.allclose(result.original_chunk, np.atleast_2d(sample.data[result.chunk_index]))
+        assert np.allclose(result.synthetic_chunk, np.atleast_2d(sample.data[result.chunk_index]) * 2)
+
+
+def test_diagnose_chunks_one_at_a_time():
+    # the detective gets the chunks as the sample returns them, here single sensor 1-D chunks
+    sample = DummySample(np.random.rand(10, 8))
+    detective = BatchDetective()
+
+    results = services.diagnostic.diagnose_chunks(detective, sample, [2, 3, 4], batched=False)
+
+    assert detective.calls == [(8,)] * 3
+    _assert_diagnosed(sample, results)
+    assert results[0].original_chunk.shape == (1, 8)
+
+
+def test_diagnose_chunks_batched():
+    sample = DummySample(np.random.rand(10, 3, 8))
+    detective = BatchDetective()
+
+    results = services.diagnostic.diagnose_chunks(detective, sample, [2, 3, 4], batched=True)
+
+    assert detective.calls == [(3, 3, 8)]
+    _assert_diagnosed(sample, results)
+
+
+def test_diagnose_chunks_batched_with_a_single_chunk_detective():
+    sample = DummySample(np.random.rand(10, 3, 8))
+
+    with pytest.raises(ValueError):
+        services.diagnostic.diagnose_chunks(SingleChunkDetective(), sample, [2, 3, 4], batched=True)
+
+
+def test_build_time_plot_data():
+    data = pd.DataFrame(np.arange(8).reshape(4, 2))
+
+    data_frame = services.diagnostic.build_time_plot_data(data, '0:00:10', 8, 2)
+
+    assert list(data_frame.index) == ['0:00:10', '0:00:10.250000', '0:00:10.500000', '0:00:10.750000']
+    assert data_frame.index.name == 'timedelta'
+    assert np.array_equal(data_frame.values, np.arange(8).reshape(4, 2))
+
+
+def test_build_frequency_plot_data_keeps_the_positive_spectrum():
+    data = pd.DataFrame(np.arange(6).reshape(6, 1))
+
+    data_frame = services.diagnostic.build_frequency_plot_data(data, 2., 4)
+
+    assert list(data_frame.index) == [2., 4.]
+    assert list(data_frame[0]) == [1, 2]
+
+
+def _raw_diagnostic_result(chunk_indexes, number_of_sensors=2, number_of_timesteps=3):
+    return [
+        {
+            'chunk_index': chunk_index,
+            'chunk_timedelta': f'0:00:{chunk_index:02d}',
+            'original': np.full((number_of_sensors, number_of_timesteps), chunk_index).tolist(),
+            'synthetic': np.full((number_of_sensors, number_of_timesteps), -chunk_index).tolist(),
+        }
+        for chunk_index in chunk_indexes
+    ]
+
+
+def test_find_adjacent_runs():
+    assert services.diagnostic.find_adjacent_runs(np.array([0, 1, 2, 5, 7, 8])) == [(0, 3), (3, 4), (4, 6)]
+    assert services.diagnostic.find_adjacent_runs(np.array([], dtype=int)) == []
+
+
+def test_group_diagnostic_result():
+    raw_diagnostic_result = _raw_diagnostic_result([8, 0, 1, 2, 7])
+
+    groups = services.diagnostic.group_diagnostic_result(
+        *services.diagnostic.stack_diagnostic_result(raw_diagnostic_result))
+
+    assert [group.chunk_index for group in groups] == [0, 7]
+    assert [group.chunk_timedelta for group in groups] == ['0:00:00', '0:00:07']
+    assert np.array_equal(groups[0].original_chunk[0], [0, 0, 0, 1, 1, 1, 2, 2, 2])
+    assert np.array_equal(groups[1].synthetic_chunk, [[-7, -7, -7, -8, -8, -8]] * 2)
+
+
+def test_group_adjacent_chunks_starting_at_the_first_chunk():
+    groups = services.diagnostic.group_adjacent_chunks(_raw_diagnostic_result([2, 0, 1, 4]))
+
+    assert [[result['chunk_index'] for result in group.list] for group in groups] == [[0, 1, 2], [4]]
+
+    cumulative_result = groups[0].get_cumulative_result()
+    assert cumulative_result.chunk_index == 0
+    assert cumulative_result.original_chunk.shape == (2, 9)
+    assert np.array_equal(cumulative_result.synthetic_chunk[1], [0, 0, 0, -1, -1, -1, -2, -2, -2])
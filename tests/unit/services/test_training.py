@@ -0,0 +1,197 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import services
+from app.core.storage import FlightStore
+from app.services.training import (
+    TrainFlightDatasource, StreamingTrainFlightDatasource, delete_training_data, load_flights, load_transformer,
+    save_transformer, select_incremental_datasources
+)
+from app.services.transformer import SimpleTransformer
+
+
+class DummyDatasource:
+
+    def __init__(self, location, number_of_timesteps, number_of_sensors):
+        self.upload_code = location
+        self.dataframe = pd.DataFrame(np.random.rand(number_of_timesteps, number_of_sensors).astype(np.float32))
+        self.store = FlightStore.from_dataframe(location, self.dataframe)
+
+    def get_store(self):
+        return self.store
+
+    def get_file(self):
+        return self.dataframe
+
+
+def test_streaming_training_datasource_matches_the_in_memory_one(tmpdir):
+    datasources = [
+        DummyDatasource(str(tmpdir.join(f'flight_{i}.hdf5')), number_of_timesteps, 3)
+        for i, number_of_timesteps in enumerate([1000, 1250, 700])
+    ]
+
+    datasource = TrainFlightDatasource(
+        [flight.get_file() for flight in datasources],
+        SimpleTransformer(number_of_timesteps=100, number_of_sensors=3)
+    )
+    streaming_datasource = StreamingTrainFlightDatasource(
+        datasources,
+        SimpleTransformer(number_of_timesteps=100, number_of_sensors=3),
+        str(tmpdir.join('training', 'training_data.npy'))
+    )
+
+    assert streaming_datasource.data.shape[0] == 10 + 12 + 7
+    assert np.allclose(streaming_datasource.get_train_data().data, datasource.get_train_data().data)
+    assert np.allclose(streaming_datasource.get_test_data().data, datasource.get_test_data().data)
+
+
+class FailingStreamingTrainFlightDatasource(StreamingTrainFlightDatasource):
+
+    def _process_flight(self, datasource):
+        if datasource is self._datasource_list[-1]:
+            raise IOError("Unreadable flight")
+        return super()._process_flight(datasource)
+
+
+def test_failed_streaming_training_datasource_leaves_no_file(tmpdir):
+    datasources = [DummyDatasource(str(tmpdir.join(f'flight_{i}.hdf5')), 1000, 3) for i in range(2)]
+    streaming_datasource = FailingStreamingTrainFlightDatasource(
+        datasources,
+        SimpleTransformer(number_of_timesteps=100, number_of_sensors=3),
+        str(tmpdir.join('training', 'training_data.npy'))
+    )
+
+    with pytest.raises(IOError):
+        streaming_datasource.get_train_data()
+
+    assert not tmpdir.join('training').listdir()
+
+
+class DummyTrainingDataTask:
+
+    def __init__(self, training_data_location):
+        self.training_data_location = training_data_location
+
+
+def test_training_data_is_deleted(tmpdir):
+    training_task = DummyTrainingDataTask(str(tmpdir.join('training', 'training_data.npy')))
+    streaming_datasource = StreamingTrainFlightDatasource(
+        [DummyDatasource(str(tmpdir.join('flight.hdf5')), 1000, 3)],
+        SimpleTransformer(number_of_timesteps=100, number_of_sensors=3),
+        training_task.training_data_location
+    )
+    train_data = streaming_datasource.get_train_data().data
+
+    delete_training_data(training_task)
+
+    assert not tmpdir.join('training').listdir()
+    assert train_data.shape[0] == 8
+    delete_training_data(training_task)
+
+
+class CountingTrainFlightDatasource(TrainFlightDatasource):
+    number_of_calls = 0
+
+    def _extract_and_process_samples(self, *args, **kwargs):
+        self.number_of_calls += 1
+        return super()._extract_and_process_samples(*args, **kwargs)
+
+
+def test_training_datasource_processes_the_flights_once():
+    datasource = CountingTrainFlightDatasource(
+        [pd.DataFrame(np.random.rand(1000, 3).astype(np.float32))],
+        SimpleTransformer(number_of_timesteps=100, number_of_sensors=3)
+    )
+
+    train_data = datasource.get_train_data().data
+    test_data = datasource.get_test_data().data
+    datasource.get_train_data()
+
+    assert datasource.number_of_calls == 1
+    assert train_data.shape[0] == 8 and test_data.shape[0] == 2
+    assert np.shares_memory(train_data, datasource.data)
+    assert np.shares_memory(test_data, datasource.data)
+
+
+class DummyTrainingTask:
+
+    def __init__(self, datasources, parent_task=None):
+        self.datasources = datasources
+        self.parent_task = parent_task
+
+
+class DummyEntity:
+
+    def __init__(self, id):
+        self.id = id
+
+
+def test_load_flights_keeps_the_datasource_order(tmpdir):
+    datasources = [
+        DummyDatasource(str(tmpdir.join(f'flight_{i}.hdf5')), number_of_timesteps, 2)
+        for i, number_of_timesteps in enumerate([300, 100, 200, 50])
+    ]
+    for datasource in datasources:
+        datasource.location = datasource.upload_code
+
+    flights = load_flights(DummyTrainingTask(datasources), number_of_workers=3)
+
+    for flight, datasource in zip(flights, datasources):
+        assert np.allclose(flight.values, datasource.dataframe.values)
+
+
+def test_load_flights_opens_the_stores_before_the_threads(tmpdir, monkeypatch):
+    datasources = [DummyDatasource(str(tmpdir.join(f'flight_{i}.hdf5')), 100, 2) for i in range(3)]
+    for datasource in datasources:
+        datasource.location = datasource.upload_code
+
+    opening_threads = []
+
+    def open_flight_store(location):
+        opening_threads.append(threading.current_thread())
+        return FlightStore(location)
+
+    monkeypatch.setattr(services.training, 'open_flight_store', open_flight_store)
+
+    load_flights(DummyTrainingTask(datasources), number_of_workers=3)
+
+    assert opening_threads == [threading.main_thread()] * 3
+
+
+class DummyTransformerTask:
+
+    def __init__(self, train_data_dir):
+        self.task_code = 'task_code'
+        self.train_data_dir = train_data_dir
+        self.transformer_location = os.path.join(train_data_dir, 'transformer.pickle')
+
+
+def test_saved_transformer_is_replaced_atomically(tmpdir):
+    training_task = DummyTransformerTask(str(tmpdir.join('training')))
+
+    save_transformer(training_task, SimpleTransformer(number_of_timesteps=100, number_of_sensors=3))
+    save_transformer(training_task, SimpleTransformer(number_of_timesteps=50, number_of_sensors=3))
+
+    assert tmpdir.join('training').listdir() == [tmpdir.join('training', 'transformer.pickle')]
+    assert load_transformer(training_task).number_of_timesteps == 50
+
+
+def test_select_incremental_datasources():
+    datasources = [DummyEntity(id) for id in range(10)]
+    grandparent = DummyTrainingTask(datasources[:4])
+    parent = DummyTrainingTask(datasources[2:6], parent_task=grandparent)
+
+    new_datasources, replayed_datasources = select_incremental_datasources(parent, datasources)
+
+    assert [datasource.id for datasource in new_datasources] == [6, 7, 8, 9]
+    assert replayed_datasources == []
+
+    new_datasources, replayed_datasources = select_incremental_datasources(parent, datasources, replay_fraction=0.5)
+
+    assert len(new_datasources) == 4
+    assert len(replayed_datasources) == 3
+    assert all(datasource.id < 6 for datasource in replayed_datasources)
@@ -0,0 +1,46 @@
+import numpy as np
+
+from app.services.transformer import SimpleTransformer, ResampleMethod, ENVELOPE_METHODS
+
+
+def test_envelope_matches_every_resample_method():
+    number_of_timesteps, number_of_sensors = 16, 3
+    flight = np.random.rand(number_of_sensors, number_of_timesteps * 5)
+    chunk_index = 2
+
+    transformer = SimpleTransformer(number_of_timesteps, number_of_sensors, downsample_factor=4)
+    chunk = flight[:, chunk_index * number_of_timesteps:(chunk_index + 1) * number_of_timesteps]
+    envelope = transformer.envelope(chunk)
+
+    for method in ENVELOPE_METHODS:
+        resampled = SimpleTransformer.create_from_original_transformer(transformer, method)
+        expected = resampled.process_stacked_samples(flight)[chunk_index]
+        assert envelope[method].shape == (number_of_sensors, number_of_timesteps // 4)
+        assert np.allclose(envelope[method], expected)
+
+
+def test_envelope_without_downsampling():
+    chunk = np.random.rand(2, 8)
+
+    envelope = SimpleTransformer(8, 2, downsample_factor=1).envelope(chunk)
+
+    for method in ENVELOPE_METHODS:
+        assert np.allclose(envelope[method], chunk)
+
+
+def test_process_stacked_samples_with_multiple_methods():
+    number_of_timesteps, number_of_sensors = 32, 4
+    methods = list(ResampleMethod)
+    transformer = SimpleTransformer(number_of_timesteps, number_of_sensors, downsample_factor=8)
+
+    # both the float64 and the transposed layouts are reduced without copying the flight
+    for flight in [np.random.rand(number_of_sensors, number_of_timesteps * 6),
+                   np.random.rand(number_of_timesteps * 6, number_of_sensors).astype(np.float32).T]:
+        stacked = transformer.process_stacked_samples(flight, methods)
+
+        assert stacked.shape == (len(methods), 6, number_of_sensors, number_of_timesteps // 8)
+        assert stacked.dtype == np.float32
+        for position, method in enumerate(methods):
+            expected = SimpleTransformer.create_from_original_transformer(
+                transformer, method).process_stacked_samples(flight)
+            assert np.allclose(stacked[position], expected, atol=1e-6)